@@ -1,10 +1,46 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-import io
-from datetime import datetime
+import os
+import uuid
+from functools import partial
 from itertools import product
 
+from dotacion_data import (
+    CATEGORIAS_DESGLOSE,
+    DESGLOSE_TOP_N,
+    DIMENSION_COLUMNS,
+    KPI_BREAKDOWNS,
+    MOVEMENT_COLUMNS,
+    TIPOS_MOVIMIENTO,
+    YEAR_COLUMN,
+    DatasetRefresher,
+    FacetCounter,
+    ResultCache,
+    default_years,
+    build_breakdown_table,
+    build_monthly_variation,
+    build_period_pivot,
+    build_range_table,
+    build_variation,
+    compute_kpis,
+    compute_movements,
+    cube_counts,
+    export_table_streaming,
+    filter_signature,
+    get_page,
+    kpi_value,
+    search_rows,
+    serialize_table_bytes,
+    summarize_movements,
+    table_content_hash,
+    top_n_counts,
+)
+from dotacion_perf import RerunProfiler, profiling_requested, sections_table
+
+# Con pandas 3 (ver requirements.txt) Copy-on-Write siempre está activo: las sesiones
+# trabajan sobre el DataFrame compartido sin copiarlo y sólo se copia lo que se modifica.
+
 # --- Configuración de la página y Estilos CSS ---
 st.set_page_config(layout="wide")
 st.markdown("""
@@ -126,6 +162,16 @@ div.stDownloadButton button:hover {
     font-size: 0.9rem;
     color: #7F8C8D;
 }
+.summary-main-kpi .trend {
+    font-size: 0.95rem;
+    color: #7F8C8D;
+}
+.summary-sub-kpi .value span {
+    font-size: 0.85rem;
+}
+.trend-up { color: #28a745; }
+.trend-down { color: #dc3545; }
+.trend-flat { color: #7F8C8D; }
 
 /* Media Query for Responsive Summary Card */
 @media (max-width: 992px) {
@@ -173,288 +219,359 @@ st.subheader('Análisis Interactivo de la Composición de la Dotación por Perio
 
 # --- Funciones Auxiliares ---
 
-def generate_download_buttons(df_to_download, filename_prefix):
-    """Genera botones para descargar un DataFrame como CSV y Excel."""
+@st.cache_data(max_entries=64, show_spinner=False)
+def serialize_table(_df_to_download, content_hash, file_format):
+    """Serializa una tabla a CSV o Excel. El caché se indexa por el hash del contenido y el formato."""
+    return serialize_table_bytes(_df_to_download, file_format)
+
+def export_table(df_to_download, file_format):
+    """Genera el archivo de descarga sólo cuando el usuario lo pide."""
+    return serialize_table(df_to_download, table_content_hash(df_to_download), file_format)
+
+def generate_download_buttons(df_to_download, filename_prefix, streaming=False):
+    """Genera botones para descargar un DataFrame como CSV y Excel.
+
+    Los archivos se generan de forma diferida, al hacer clic en el botón, y se
+    reutilizan mientras el contenido de la tabla no cambie. Con `streaming=True`
+    se escriben por lotes en disco, para tablas grandes como los datos brutos.
+    """
     st.markdown("##### Opciones de Descarga:")
     col_dl1, col_dl2 = st.columns(2)
+    exporter = export_table_streaming if streaming else export_table
+    filas = len(df_to_download)
 
     # Descarga CSV
-    csv_buffer = io.StringIO()
-    df_to_download.to_csv(csv_buffer, index=False)
     with col_dl1:
         st.download_button(
             label="⬇️ Descargar como CSV",
-            data=csv_buffer.getvalue(),
+            data=profiler.timed(f"descarga {filename_prefix}.csv", partial(exporter, df_to_download, 'csv'), filas),
             file_name=f"{filename_prefix}.csv",
             mime="text/csv",
             key=f"csv_download_{filename_prefix}"
         )
 
     # Descarga Excel
-    excel_buffer = io.BytesIO()
-    df_to_download.to_excel(excel_buffer, index=False, engine='openpyxl')
-    excel_buffer.seek(0)
     with col_dl2:
         st.download_button(
             label="📊 Descargar como Excel",
-            data=excel_buffer.getvalue(),
+            data=profiler.timed(f"descarga {filename_prefix}.xlsx", partial(exporter, df_to_download, 'xlsx'), filas),
             file_name=f"{filename_prefix}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             key=f"excel_download_{filename_prefix}"
         )
 
-@st.cache_data
-def load_and_clean_data(url):
-    """Carga y limpia los datos desde la URL de un archivo Excel en GitHub."""
-    df_excel = pd.DataFrame()
-    try:
-        df_excel = pd.read_excel(url, sheet_name='Dotacion_25', engine='openpyxl')
-    except Exception as e:
-        st.error(f"ERROR CRÍTICO: No se pudo leer la hoja 'Dotacion_25' desde la URL. Mensaje: {e}")
-        return pd.DataFrame()
-
-    if df_excel.empty:
-        return pd.DataFrame()
-
-    if 'LEGAJO' in df_excel.columns:
-        df_excel['LEGAJO'] = pd.to_numeric(df_excel['LEGAJO'], errors='coerce')
-
-    excel_col_fecha_ingreso_raw = 'Fecha ing.'
-    excel_col_fecha_nacimiento_raw = 'Fecha Nac.'
-    excel_col_rango_antiguedad_raw = 'Rango (Antigüedad)'
-    excel_col_rango_edad_raw = 'Rango (Edad)'
-
-    # --- RANGO ANTIGÜEDAD ---
-    if excel_col_rango_antiguedad_raw in df_excel.columns and df_excel[excel_col_rango_antiguedad_raw].notna().sum() > 0:
-        df_excel['Rango Antiguedad'] = df_excel[excel_col_rango_antiguedad_raw].astype(str).str.strip().str.lower()
-    else:
-        if excel_col_fecha_ingreso_raw in df_excel.columns:
-            temp_fecha_ingreso = pd.to_datetime(df_excel[excel_col_fecha_ingreso_raw], errors='coerce')
-            if temp_fecha_ingreso.notna().sum() > 0:
-                df_excel['Antiguedad (años)'] = (datetime.now() - temp_fecha_ingreso).dt.days / 365.25
-                bins_antiguedad = [0, 5, 10, 15, 20, 25, 30, 35, float('inf')]
-                labels_antiguedad = ['de 0 a 5 años', 'de 5 a 10 años', 'de 11 a 15 años', 'de 16 a 20 años', 'de 21 a 25 años', 'de 26 a 30 años', 'de 31 a 35 años', 'más de 35 años']
-                df_excel['Rango Antiguedad'] = pd.cut(df_excel['Antiguedad (años)'], bins=bins_antiguedad, labels=labels_antiguedad, right=False, include_lowest=True).astype(str).str.strip().str.lower()
-            else:
-                df_excel['Rango Antiguedad'] = 'no disponible'
+@st.cache_resource(show_spinner=False, on_release=DatasetRefresher.stop)
+def get_dataset_refresher(urls):
+    """Cargador de fondo del proceso: arranca con la primera ejecución y recarga el dataset periódicamente.
+
+    Todas las sesiones leen la misma versión publicada (el DataFrame de sólo lectura y
+    sus estructuras derivadas), sin copias; ninguna ejecución espera a la carga. La
+    caché de resultados va con el cargador, que la precarga con la vista inicial de
+    cada versión. Al vaciarse la caché de recursos, el hilo del cargador se detiene.
+    """
+    return DatasetRefresher(urls, result_cache=ResultCache()).start()
+
+@st.fragment(run_every=2)
+def wait_for_dataset(refresher):
+    """Vuelve a ejecutar la página cuando el cargador de fondo publica la primera versión."""
+    if refresher.current is not None:
+        st.rerun()
+
+def cached_result(key, compute):
+    """Resultado para la versión publicada del dataset; `key` empieza con la firma de los filtros.
+
+    La vista inicial ya la calcula el cargador con `seed_default_results`: sus claves
+    tienen que coincidir con las que se usan aquí.
+    """
+    return refresher.result_cache.get_or_compute(dataset.version, key, compute)
+
+def format_trend(variacion):
+    """Flecha y diferencia contra el periodo anterior, como HTML para la tarjeta de resumen."""
+    if pd.isna(variacion):
+        return ''
+    if variacion > 0:
+        return f'<span class="trend-up">▲ +{int(variacion)}</span>'
+    if variacion < 0:
+        return f'<span class="trend-down">▼ {int(variacion)}</span>'
+    return '<span class="trend-flat">= 0</span>'
+
+PAGE_SIZE_OPTIONS = [25, 50, 100, 250, 500]
+
+def create_profiler():
+    """Instrumentación de la ejecución, activa con DOTACION_PROFILE=1 o `?profile=1`."""
+    if not profiling_requested(st.query_params.get('profile')):
+        return RerunProfiler(enabled=False)
+    session_id = st.session_state.setdefault('perf_session_id', uuid.uuid4().hex)
+    return RerunProfiler(enabled=True, session_id=session_id, downloads=st.session_state.setdefault('perf_descargas', []))
+
+def filter_key(column):
+    """Clave de session_state del multiselect de la barra lateral para `column`."""
+    return f'filtro_{column}'
+
+def get_facet_counter(cube):
+    """Motor de conteos facetados de la sesión; se reconstruye si cambia el cubo."""
+    counter = st.session_state.get('facet_counter')
+    if counter is None or counter.cube is not cube:
+        counter = FacetCounter(cube, linked={YEAR_COLUMN: ['Periodo']})
+        st.session_state['facet_counter'] = counter
+    return counter
+
+def reset_period_filter():
+    """Al cambiar los años, el filtro de periodos vuelve a todos los periodos de esos años."""
+    st.session_state.pop(filter_key('Periodo'), None)
+
+def sync_filters_with_version(dataset):
+    """Adapta los filtros de la sesión cuando el cargador publica una versión nueva.
+
+    El Año y el Periodo vuelven a sus valores por defecto, como al cambiar de año,
+    para que un mes nuevo no quede afuera. En los demás filtros, una selección que
+    tenía todas las opciones pasa a tener también las nuevas, y se descartan los
+    valores que ya no existen.
+    """
+    version_anterior = st.session_state.get('dataset_version')
+    st.session_state['dataset_version'] = dataset.version
+    if version_anterior is None or version_anterior == dataset.version:
+        return
+    opciones_anteriores = st.session_state.get('opciones_filtros', {})
+    for col in DIMENSION_COLUMNS:
+        seleccion = st.session_state.get(filter_key(col))
+        if seleccion is None:
+            continue
+        if col in (YEAR_COLUMN, 'Periodo') or set(seleccion) >= set(opciones_anteriores.get(col, ())):
+            st.session_state.pop(filter_key(col))
         else:
-            df_excel['Rango Antiguedad'] = 'no disponible'
-
-    # --- RANGO EDAD ---
-    if excel_col_rango_edad_raw in df_excel.columns and df_excel[excel_col_rango_edad_raw].notna().sum() > 0:
-        df_excel['Rango Edad'] = df_excel[excel_col_rango_edad_raw].astype(str).str.strip().str.lower()
-    else:
-        if excel_col_fecha_nacimiento_raw in df_excel.columns:
-            temp_fecha_nacimiento = pd.to_datetime(df_excel[excel_col_fecha_nacimiento_raw], errors='coerce')
-            if temp_fecha_nacimiento.notna().sum() > 0:
-                df_excel['Edad (años)'] = (datetime.now() - temp_fecha_nacimiento).dt.days / 365.25
-                bins_edad = [0, 19, 25, 30, 35, 40, 45, 50, 55, 60, 65, float('inf')]
-                labels_edad = ['de 0 a 19 años', 'de 19 a 25 años', 'de 26 a 30 años', 'de 31 a 35 años', 'de 36 a 40 años', 'de 41 a 45 años', 'de 46 a 50 años', 'de 51 a 55 años', 'de 56 a 60 años', 'de 61 a 65 años', 'más de 65 años']
-                df_excel['Rango Edad'] = pd.cut(df_excel['Edad (años)'], bins=bins_edad, labels=labels_edad, right=False, include_lowest=True).astype(str).str.strip().str.lower()
-            else:
-                df_excel['Rango Edad'] = 'no disponible'
-        else:
-            df_excel['Rango Edad'] = 'no disponible'
-
-    # --- PERIODO ---
-    if 'Periodo' in df_excel.columns:
-        try:
-            temp_periodo = pd.to_datetime(df_excel['Periodo'], errors='coerce')
-            if temp_periodo.notna().any():
-                spanish_months_map = {1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril', 5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto', 9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'}
-                df_excel['Periodo'] = temp_periodo.dt.month.map(spanish_months_map).astype(str)
-            else:
-                df_excel['Periodo'] = df_excel['Periodo'].astype(str).str.strip().str.capitalize()
-        except Exception:
-            df_excel['Periodo'] = df_excel['Periodo'].astype(str).str.strip().str.capitalize()
-    
-    # --- LIMPIEZA FINAL ---
-    text_cols_for_filters_charts = ['Gerencia', 'Relación', 'Sexo', 'Función', 'Distrito', 'Ministerio', 'Rango Antiguedad', 'Rango Edad', 'Periodo', 'Nivel']
-    for col in text_cols_for_filters_charts:
-        if col not in df_excel.columns:
-            df_excel[col] = 'no disponible'
-        df_excel[col] = df_excel[col].astype(str).replace(['None', 'nan', ''], 'no disponible').str.strip()
-        if col in ['Rango Antiguedad', 'Rango Edad']:
-             df_excel[col] = df_excel[col].str.lower()
-        elif col == 'Periodo':
-             df_excel[col] = df_excel[col].str.capitalize()
-
-
-    return df_excel
-
-def get_sorted_unique_options(dataframe, column_name):
-    """Obtiene opciones únicas y ordenadas para los filtros."""
-    if column_name in dataframe.columns:
-        unique_values = dataframe[column_name].dropna().unique().tolist()
-        
-        if column_name == 'Rango Antiguedad':
-            order = ['de 0 a 5 años', 'de 5 a 10 años', 'de 11 a 15 años', 'de 16 a 20 años', 'de 21 a 25 años', 'de 26 a 30 años', 'de 31 a 35 años', 'más de 35 años', 'no disponible']
-            present_values = [val for val in order if val in unique_values]
-            other_values = [val for val in unique_values if val not in order]
-            return present_values + sorted(other_values)
-        
-        elif column_name == 'Rango Edad':
-            order = ['de 0 a 19 años', 'de 19 a 25 años', 'de 26 a 30 años', 'de 31 a 35 años', 'de 36 a 40 años', 'de 41 a 45 años', 'de 46 a 50 años', 'de 51 a 55 años', 'de 56 a 60 años', 'de 61 a 65 años', 'más de 65 años', 'no disponible']
-            present_values = [val for val in order if val in unique_values]
-            other_values = [val for val in unique_values if val not in order]
-            return present_values + sorted(other_values)
-            
-        elif column_name == 'Periodo':
-            month_order = {'Enero': 1, 'Febrero': 2, 'Marzo': 3, 'Abril': 4, 'Mayo': 5, 'Junio': 6, 'Julio': 7, 'Agosto': 8, 'Septiembre': 9, 'Octubre': 10, 'Noviembre': 11, 'Diciembre': 12, 'No disponible': 99}
-            return sorted(unique_values, key=lambda x: month_order.get(x, 99))
-        
-        return sorted(unique_values)
-    return ['no disponible']
+            st.session_state[filter_key(col)] = [valor for valor in seleccion if valor in dataset.catalog.positions.get(col, {})]
+    st.toast('Se publicaron datos nuevos: los filtros de Año y Periodo volvieron a sus valores por defecto.')
+
+def sidebar_multiselect(label, column, options, default, facets, **kwargs):
+    """Multiselect de la barra lateral que muestra, junto a cada opción, cuántos empleados
+    quedan al elegirla con las selecciones actuales de los demás filtros."""
+    conteos = facets.get(column, {})
+    return st.sidebar.multiselect(label, options, default=default, key=filter_key(column),
+                                  format_func=lambda value: f"{value} ({conteos.get(value, 0)})", **kwargs)
+
+def render_profile_panel(entry, downloads):
+    """Muestra en la barra lateral el desglose de tiempos de la ejecución."""
+    with st.sidebar.expander('⏱️ Tiempos de ejecución', expanded=False):
+        st.caption(f"Ejecución total: {entry['total_seconds'] * 1000:.0f} ms")
+        if 'cache_resultados' in entry:
+            cache = entry['cache_resultados']
+            st.caption(f"Caché de resultados: {cache['entradas']} entradas, {cache['mb']:.1f} MB, "
+                       f"{cache['aciertos']} aciertos / {cache['fallos']} fallos")
+        st.dataframe(pd.DataFrame(sections_table(entry)), hide_index=True)
+        if downloads:
+            st.caption('Últimas descargas')
+            st.dataframe(pd.DataFrame(sections_table({'sections': downloads[-5:]})), hide_index=True)
 
 
 # --- Cuerpo Principal de la Aplicación ---
-EXCEL_URL = 'https://raw.githubusercontent.com/Tincho2002/dotacion_assa_2025/main/Dotacion_25.xlsx'
-
-with st.spinner('Cargando datos desde GitHub...'):
-    df = load_and_clean_data(EXCEL_URL)
-
-if df.empty:
-    st.error("No se pudieron cargar los datos desde GitHub. Verifica la URL y que el repositorio sea público.")
+# Uno o más libros (URLs separadas por espacios); cada uno con sus hojas anuales 'Dotacion_AA'.
+EXCEL_URLS = tuple(os.environ.get('DOTACION_EXCEL_URL', 'https://raw.githubusercontent.com/Tincho2002/dotacion_assa_2025/main/Dotacion_25.xlsx').split())
+profiler = create_profiler()
+
+with profiler.section('carga') as seccion:
+    refresher = get_dataset_refresher(EXCEL_URLS)
+    # Una sola lectura de la versión publicada: toda la ejecución usa la misma.
+    dataset = refresher.current
+    seccion['rows_out'] = len(dataset.frame) if dataset is not None else 0
+
+if dataset is None:
+    if refresher.last_error is not None:
+        st.error(f"ERROR CRÍTICO: {refresher.last_error}")
+        st.error("No se pudieron cargar los datos desde GitHub. Verifica la URL y que el repositorio sea público.")
+    else:
+        st.info('Cargando datos desde GitHub... la página se actualizará sola al terminar.')
+    wait_for_dataset(refresher)
     st.stop()
 
+df = dataset.frame
+
 st.success(f"Se ha cargado un total de **{len(df)}** registros de empleados.")
 st.markdown("---")
 
 # --- Barra Lateral de Filtros ---
 st.sidebar.header('Filtros del Dashboard')
 
-all_periodos = get_sorted_unique_options(df, 'Periodo')
-selected_periodos = st.sidebar.multiselect('Selecciona Periodo(s):', all_periodos, default=all_periodos)
+catalog = dataset.catalog
+headcount_cube = dataset.cube
+
+sync_filters_with_version(dataset)
+
+# El año va primero: recorta rangos enteros de filas antes de los demás filtros.
+all_anios = catalog.options(YEAR_COLUMN)
+default_anios = default_years(catalog)
+all_periodos = catalog.options_within('Periodo', YEAR_COLUMN, st.session_state.get(filter_key(YEAR_COLUMN), default_anios))
+
+# Los conteos de cada opción dependen de las selecciones de todos los filtros, que se
+# leen de session_state antes de dibujar los multiselect (valores por defecto si aún no existen).
+defaults = {col: catalog.options(col) for col in DIMENSION_COLUMNS}
+defaults.update({YEAR_COLUMN: default_anios, 'Periodo': all_periodos})
+facets = get_facet_counter(headcount_cube).update(
+    {col: st.session_state.get(filter_key(col), default) for col, default in defaults.items()}
+)
 
-all_gerencias = get_sorted_unique_options(df, 'Gerencia')
-selected_gerencias = st.sidebar.multiselect('Selecciona Gerencia(s):', all_gerencias, default=all_gerencias)
+selected_anios = sidebar_multiselect('Selecciona Año(s):', YEAR_COLUMN, all_anios, default_anios, facets,
+                                     on_change=reset_period_filter)
+selected_periodos = sidebar_multiselect('Selecciona Periodo(s):', 'Periodo', all_periodos, all_periodos, facets)
 
-all_relaciones = get_sorted_unique_options(df, 'Relación')
-selected_relaciones = st.sidebar.multiselect('Selecciona Relación(es):', all_relaciones, default=all_relaciones)
+all_gerencias = catalog.options('Gerencia')
+selected_gerencias = sidebar_multiselect('Selecciona Gerencia(s):', 'Gerencia', all_gerencias, all_gerencias, facets)
 
-all_sexos = get_sorted_unique_options(df, 'Sexo')
-selected_sexos = st.sidebar.multiselect('Selecciona Sexo(s):', all_sexos, default=all_sexos)
+all_relaciones = catalog.options('Relación')
+selected_relaciones = sidebar_multiselect('Selecciona Relación(es):', 'Relación', all_relaciones, all_relaciones, facets)
 
-all_rangos_antiguedad = get_sorted_unique_options(df, 'Rango Antiguedad')
-selected_rangos_antiguedad = st.sidebar.multiselect('Selecciona Rango(s) de Antigüedad:', all_rangos_antiguedad, default=all_rangos_antiguedad)
+all_sexos = catalog.options('Sexo')
+selected_sexos = sidebar_multiselect('Selecciona Sexo(s):', 'Sexo', all_sexos, all_sexos, facets)
 
-all_rangos_edad = get_sorted_unique_options(df, 'Rango Edad')
-selected_rangos_edad = st.sidebar.multiselect('Selecciona Rango(s) de Edad:', all_rangos_edad, default=all_rangos_edad)
+all_rangos_antiguedad = catalog.options('Rango Antiguedad')
+selected_rangos_antiguedad = sidebar_multiselect('Selecciona Rango(s) de Antigüedad:', 'Rango Antiguedad', all_rangos_antiguedad, all_rangos_antiguedad, facets)
 
-all_funciones = get_sorted_unique_options(df, 'Función')
-selected_funciones = st.sidebar.multiselect('Selecciona Función(es):', all_funciones, default=all_funciones)
+all_rangos_edad = catalog.options('Rango Edad')
+selected_rangos_edad = sidebar_multiselect('Selecciona Rango(s) de Edad:', 'Rango Edad', all_rangos_edad, all_rangos_edad, facets)
 
-all_distritos = get_sorted_unique_options(df, 'Distrito')
-selected_distritos = st.sidebar.multiselect('Selecciona Distrito(s):', all_distritos, default=all_distritos)
+all_funciones = catalog.options('Función')
+selected_funciones = sidebar_multiselect('Selecciona Función(es):', 'Función', all_funciones, all_funciones, facets)
 
-all_ministerios = get_sorted_unique_options(df, 'Ministerio')
-selected_ministerios = st.sidebar.multiselect('Selecciona Ministerio(s):', all_ministerios, default=all_ministerios)
+all_distritos = catalog.options('Distrito')
+selected_distritos = sidebar_multiselect('Selecciona Distrito(s):', 'Distrito', all_distritos, all_distritos, facets)
 
-all_niveles = get_sorted_unique_options(df, 'Nivel')
-selected_niveles = st.sidebar.multiselect('Selecciona Nivel(es):', all_niveles, default=all_niveles)
+all_ministerios = catalog.options('Ministerio')
+selected_ministerios = sidebar_multiselect('Selecciona Ministerio(s):', 'Ministerio', all_ministerios, all_ministerios, facets)
+
+all_niveles = catalog.options('Nivel')
+selected_niveles = sidebar_multiselect('Selecciona Nivel(es):', 'Nivel', all_niveles, all_niveles, facets)
+
+# Opciones de esta versión, para adaptar las selecciones cuando se publique otra.
+st.session_state['opciones_filtros'] = defaults
 
 # --- Lógica de Filtrado ---
-query_parts = []
-if selected_periodos: query_parts.append("`Periodo` in @selected_periodos")
-if selected_gerencias: query_parts.append("`Gerencia` in @selected_gerencias")
-if selected_relaciones: query_parts.append("`Relación` in @selected_relaciones")
-if selected_sexos: query_parts.append("`Sexo` in @selected_sexos")
-if selected_rangos_antiguedad: query_parts.append("`Rango Antiguedad` in @selected_rangos_antiguedad")
-if selected_rangos_edad: query_parts.append("`Rango Edad` in @selected_rangos_edad")
-if selected_funciones: query_parts.append("`Función` in @selected_funciones")
-if selected_distritos: query_parts.append("`Distrito` in @selected_distritos")
-if selected_ministerios: query_parts.append("`Ministerio` in @selected_ministerios")
-if selected_niveles: query_parts.append("`Nivel` in @selected_niveles")
-
-if query_parts:
-    filtered_df = df.query(" and ".join(query_parts))
-else:
-    filtered_df = df.copy()
+with profiler.section('filtrado', rows_in=len(df)) as seccion:
+    selections = {
+        YEAR_COLUMN: selected_anios,
+        'Periodo': selected_periodos,
+        'Gerencia': selected_gerencias,
+        'Relación': selected_relaciones,
+        'Sexo': selected_sexos,
+        'Rango Antiguedad': selected_rangos_antiguedad,
+        'Rango Edad': selected_rangos_edad,
+        'Función': selected_funciones,
+        'Distrito': selected_distritos,
+        'Ministerio': selected_ministerios,
+        'Nivel': selected_niveles,
+    }
+    # Las vistas repetidas (todo seleccionado, una sola Gerencia...) se sirven de la caché compartida.
+    # Se guardan sólo las selecciones de filas y celdas: las vistas se arman en cada ejecución,
+    # así la caché no retiene copias del dataset (ni lo cuenta cuando la vista es el dataset entero).
+    firma_filtros = filter_signature(selections, catalog)
+    seleccion_filas, seleccion_celdas = cached_result(
+        (firma_filtros, 'filtrado'),
+        lambda: (dataset.filter_index.select(selections), headcount_cube.select(selections)),
+    )
+    filtered_df = dataset.filter_index.take(df, seleccion_filas)
+    filtered_cube = headcount_cube.take(seleccion_celdas)
+    seccion['rows_out'] = len(filtered_df)
 
 
 st.write(f"Después de aplicar los filtros, se muestran **{len(filtered_df)}** registros.")
 st.markdown("---")
 
 # --- Resumen del Último Mes ---
-if not filtered_df.empty and selected_periodos:
-    try:
-        # Asegurar el orden correcto de los periodos para encontrar el último
-        periodos_ordenados = get_sorted_unique_options(df, 'Periodo')
-        periodos_seleccionados_ordenados = [p for p in periodos_ordenados if p in selected_periodos]
+with profiler.section('resumen_ultimo_mes', rows_in=len(filtered_df)) as seccion:
+    if not filtered_df.empty and selected_periodos:
+        try:
+            # Asegurar el orden correcto de los periodos para encontrar el último
+            periodos_seleccionados_ordenados = catalog.sort('Periodo', selected_periodos)
         
-        if periodos_seleccionados_ordenados:
-            latest_period = periodos_seleccionados_ordenados[-1]
-            df_latest_month = filtered_df[filtered_df['Periodo'] == latest_period].copy()
-
-            total_dotacion = len(df_latest_month)
-            convenio_count = df_latest_month[df_latest_month['Relación'] == 'Convenio'].shape[0]
-            fc_count = df_latest_month[df_latest_month['Relación'] == 'FC'].shape[0]
-            masculino_count = df_latest_month[df_latest_month['Sexo'] == 'Masculino'].shape[0]
-            femenino_count = df_latest_month[df_latest_month['Sexo'] == 'Femenino'].shape[0]
-            
-            # Calculo de porcentajes con seguridad para división por cero
-            convenio_pct = (convenio_count / total_dotacion * 100) if total_dotacion > 0 else 0
-            fc_pct = (fc_count / total_dotacion * 100) if total_dotacion > 0 else 0
-            masculino_pct = (masculino_count / total_dotacion * 100) if total_dotacion > 0 else 0
-            femenino_pct = (femenino_count / total_dotacion * 100) if total_dotacion > 0 else 0
-
-            st.markdown(f"""
-            <div class="summary-container">
-                <div class="summary-main-kpi">
-                    <div class="title">DOTACIÓN {latest_period.upper()}</div>
-                    <div class="value">👥 {total_dotacion}</div>
-                </div>
-                <div class="summary-breakdown">
-                    <div class="summary-row">
-                        <div class="summary-sub-kpi">
-                            <div class="icon">📄</div>
-                            <div class="details">
-                                <div class="value">{convenio_count}</div>
-                                <div class="label">Convenio ({convenio_pct:.1f}%)</div>
+            if periodos_seleccionados_ordenados:
+                latest_period = periodos_seleccionados_ordenados[-1]
+                # Todos los indicadores de todos los periodos elegidos, en una pasada sobre el cubo
+                kpi_totales, kpis = cached_result(
+                    (firma_filtros, 'kpis'), lambda: compute_kpis(filtered_cube, periodos_seleccionados_ordenados)
+                )
+
+                total_dotacion = int(kpi_totales['Cantidad'].iloc[-1])
+                seccion['rows_out'] = total_dotacion
+                convenio = kpi_value(kpis, latest_period, 'Relación', 'Convenio')
+                fc = kpi_value(kpis, latest_period, 'Relación', 'FC')
+                masculino = kpi_value(kpis, latest_period, 'Sexo', 'Masculino')
+                femenino = kpi_value(kpis, latest_period, 'Sexo', 'Femenino')
+                periodo_anterior = periodos_seleccionados_ordenados[-2] if len(periodos_seleccionados_ordenados) > 1 else None
+                tendencia_total = f"{format_trend(kpi_totales['Variación'].iloc[-1])} vs {periodo_anterior}" if periodo_anterior else ''
+
+                st.markdown(f"""
+                <div class="summary-container">
+                    <div class="summary-main-kpi">
+                        <div class="title">DOTACIÓN {latest_period.upper()}</div>
+                        <div class="value">👥 {total_dotacion}</div>
+                        <div class="trend">{tendencia_total}</div>
+                    </div>
+                    <div class="summary-breakdown">
+                        <div class="summary-row">
+                            <div class="summary-sub-kpi">
+                                <div class="icon">📄</div>
+                                <div class="details">
+                                    <div class="value">{int(convenio['Cantidad'])} {format_trend(convenio['Variación'])}</div>
+                                    <div class="label">Convenio ({convenio['Porcentaje']:.1f}%)</div>
+                                </div>
                             </div>
-                        </div>
-                        <div class="summary-sub-kpi">
-                            <div class="icon">💼</div>
-                            <div class="details">
-                                <div class="value">{fc_count}</div>
-                                <div class="label">Fuera de Convenio ({fc_pct:.1f}%)</div>
+                            <div class="summary-sub-kpi">
+                                <div class="icon">💼</div>
+                                <div class="details">
+                                    <div class="value">{int(fc['Cantidad'])} {format_trend(fc['Variación'])}</div>
+                                    <div class="label">Fuera de Convenio ({fc['Porcentaje']:.1f}%)</div>
+                                </div>
                             </div>
                         </div>
-                    </div>
-                    <div class="summary-row">
-                        <div class="summary-sub-kpi">
-                            <div class="icon">👨</div>
-                            <div class="details">
-                                <div class="value">{masculino_count}</div>
-                                <div class="label">Masculino ({masculino_pct:.1f}%)</div>
+                        <div class="summary-row">
+                            <div class="summary-sub-kpi">
+                                <div class="icon">👨</div>
+                                <div class="details">
+                                    <div class="value">{int(masculino['Cantidad'])} {format_trend(masculino['Variación'])}</div>
+                                    <div class="label">Masculino ({masculino['Porcentaje']:.1f}%)</div>
+                                </div>
                             </div>
-                        </div>
-                        <div class="summary-sub-kpi">
-                            <div class="icon">👩</div>
-                            <div class="details">
-                                <div class="value">{femenino_count}</div>
-                                <div class="label">Femenino ({femenino_pct:.1f}%)</div>
+                            <div class="summary-sub-kpi">
+                                <div class="icon">👩</div>
+                                <div class="details">
+                                    <div class="value">{int(femenino['Cantidad'])} {format_trend(femenino['Variación'])}</div>
+                                    <div class="label">Femenino ({femenino['Porcentaje']:.1f}%)</div>
+                                </div>
                             </div>
                         </div>
                     </div>
                 </div>
-            </div>
-            """, unsafe_allow_html=True)
-            st.markdown("<br>", unsafe_allow_html=True)
-
-    except Exception as e:
-        st.warning(f"No se pudo generar el resumen del último mes. Error: {e}")
+                """, unsafe_allow_html=True)
+
+                # Otras aperturas del mismo cálculo, sin recorrer de nuevo los datos
+                otras_aperturas = [apertura for apertura in KPI_BREAKDOWNS if apertura not in ('Relación', 'Sexo')]
+                with st.expander(f"Dotación {latest_period} por {' y '.join(otras_aperturas)}"):
+                    for columna_apertura, apertura in zip(st.columns(len(otras_aperturas)), otras_aperturas):
+                        with columna_apertura:
+                            tabla_apertura = kpis[(kpis['Periodo'] == latest_period) & (kpis['Apertura'] == apertura)]
+                            st.dataframe(
+                                tabla_apertura[['Valor', 'Cantidad', 'Porcentaje', 'Variación']].rename(columns={'Valor': apertura}),
+                                hide_index=True,
+                                column_config={
+                                    'Porcentaje': st.column_config.NumberColumn(format='%.1f%%'),
+                                    'Variación': st.column_config.NumberColumn(format='%+d'),
+                                },
+                            )
+                st.markdown("<br>", unsafe_allow_html=True)
+
+        except Exception as e:
+            st.warning(f"No se pudo generar el resumen del último mes. Error: {e}")
 
 # --- Pestañas de Visualización ---
-tab1, tab_edad_antiguedad, tab2, tab3 = st.tabs([
+tab1, tab_edad_antiguedad, tab2, tab_movimientos, tab3 = st.tabs([
     "📊 Resumen de Dotación",
     "⏳ Edad y Antigüedad por Periodo",
     "📈 Desglose por Categoría",
+    "🔀 Altas y Bajas",
     "📋 Datos Brutos"
 ])
 
 # --- PESTAÑA 1: RESUMEN (MODIFICADA) ---
-with tab1:
+with tab1, profiler.section('pestana_resumen', rows_in=len(filtered_df)) as seccion:
     st.header('Resumen General de la Dotación')
     if filtered_df.empty:
         st.warning("No hay datos para mostrar con los filtros seleccionados.")
@@ -463,10 +580,7 @@ with tab1:
         
         # --- Dotación por Periodo (Total) ---
         st.subheader('Dotación por Periodo (Total)')
-        periodo_counts = filtered_df.groupby('Periodo').size().reset_index(name='Cantidad')
-        
-        periodo_counts['Periodo'] = pd.Categorical(periodo_counts['Periodo'], categories=all_periodos, ordered=True)
-        periodo_counts = periodo_counts.sort_values('Periodo').reset_index(drop=True)
+        periodo_counts = cached_result((firma_filtros, 'periodo'), lambda: cube_counts(filtered_cube, 'Periodo'))
 
         line_periodo = alt.Chart(periodo_counts).mark_line(point=True).encode(
             x=alt.X('Periodo', sort=all_periodos, title='Periodo'),
@@ -481,12 +595,13 @@ with tab1:
         chart_periodo = (line_periodo + text_periodo).properties(title='Evolución de la Dotación Total por Periodo')
         st.altair_chart(chart_periodo, use_container_width=True)
         st.dataframe(periodo_counts)
+        seccion['rows_out'] = len(periodo_counts)
         generate_download_buttons(periodo_counts, 'dotacion_total_por_periodo')
         st.markdown('---')
 
         # --- Distribución por Sexo por Periodo (CORRECCIÓN FINAL) ---
         st.subheader('Distribución Comparativa por Sexo')
-        sexo_counts = filtered_df.groupby(['Periodo', 'Sexo']).size().reset_index(name='Cantidad')
+        sexo_counts = cached_result((firma_filtros, 'sexo'), lambda: cube_counts(filtered_cube, ['Periodo', 'Sexo']))
         
         layers_sexo = []
         
@@ -520,17 +635,14 @@ with tab1:
         else:
             st.warning("No hay datos de 'Sexo' para mostrar con los filtros seleccionados.")
 
-        sexo_pivot = sexo_counts.pivot_table(index='Periodo', columns='Sexo', values='Cantidad', fill_value=0)
-        sexo_pivot['Total'] = sexo_pivot.sum(axis=1)
-        sexo_pivot.index = pd.Categorical(sexo_pivot.index, categories=all_periodos, ordered=True)
-        sexo_pivot = sexo_pivot.sort_index()
-        st.dataframe(sexo_pivot.reset_index())
-        generate_download_buttons(sexo_pivot.reset_index(), 'distribucion_sexo_por_periodo')
+        sexo_pivot = cached_result((firma_filtros, 'sexo_pivot'), lambda: build_period_pivot(sexo_counts, 'Sexo'))
+        st.dataframe(sexo_pivot)
+        generate_download_buttons(sexo_pivot, 'distribucion_sexo_por_periodo')
         st.markdown('---')
 
         # --- Distribución por Relación por Periodo (CORRECCIÓN FINAL) ---
         st.subheader('Distribución Comparativa por Relación')
-        relacion_counts = filtered_df.groupby(['Periodo', 'Relación']).size().reset_index(name='Cantidad')
+        relacion_counts = cached_result((firma_filtros, 'relacion'), lambda: cube_counts(filtered_cube, ['Periodo', 'Relación']))
         
         layers_relacion = []
         
@@ -564,32 +676,15 @@ with tab1:
         else:
             st.warning("No hay datos de 'Relación' para mostrar con los filtros seleccionados.")
 
-        relacion_pivot = relacion_counts.pivot_table(index='Periodo', columns='Relación', values='Cantidad', fill_value=0)
-        relacion_pivot['Total'] = relacion_pivot.sum(axis=1)
-        relacion_pivot.index = pd.Categorical(relacion_pivot.index, categories=all_periodos, ordered=True)
-        relacion_pivot = relacion_pivot.sort_index()
-        st.dataframe(relacion_pivot.reset_index())
-        generate_download_buttons(relacion_pivot.reset_index(), 'distribucion_relacion_por_periodo')
+        relacion_pivot = cached_result((firma_filtros, 'relacion_pivot'), lambda: build_period_pivot(relacion_counts, 'Relación'))
+        st.dataframe(relacion_pivot)
+        generate_download_buttons(relacion_pivot, 'distribucion_relacion_por_periodo')
         st.markdown('---')
 
         # --- Variación Mensual ---
         st.subheader('Variación Mensual de Dotación (Total)')
-        month_order_map = {name: i for i, name in enumerate(all_periodos) if name != 'No disponible'}
-        
-        periodo_var_counts = filtered_df.groupby('Periodo').size().reset_index(name='Cantidad_Actual')
-        periodo_var_counts['sort_key'] = periodo_var_counts['Periodo'].map(month_order_map)
-        periodo_var_counts = periodo_var_counts.sort_values('sort_key').reset_index(drop=True)
-        
-        periodo_var_counts['Cantidad_Mes_Anterior'] = periodo_var_counts['Cantidad_Actual'].shift(1)
-        periodo_var_counts['Variacion_Cantidad'] = periodo_var_counts['Cantidad_Actual'] - periodo_var_counts['Cantidad_Mes_Anterior']
-        periodo_var_counts['Variacion_%'] = (periodo_var_counts['Variacion_Cantidad'] / periodo_var_counts['Cantidad_Mes_Anterior'] * 100)
-        periodo_var_counts['label'] = periodo_var_counts.apply(lambda row: f"{row['Variacion_Cantidad']:.0f} ({row['Variacion_%']:.2f}%)" if pd.notna(row['Variacion_%']) else "", axis=1)
-        
-        display_var_table = periodo_var_counts.copy().drop(columns=['label', 'sort_key'])
-        display_var_table['Variacion_%'] = display_var_table['Variacion_%'].map('{:.2f}%'.format, na_action='ignore')
-        for col in ['Cantidad_Mes_Anterior', 'Variacion_Cantidad']:
-            display_var_table[col] = pd.to_numeric(display_var_table[col], errors='coerce').astype('Int64').astype(str).replace('<NA>', '')
-        display_var_table = display_var_table.fillna('')
+        # El orden cronológico lo da el tipo categórico de 'Periodo'
+        periodo_var_counts, display_var_table = cached_result((firma_filtros, 'variacion'), lambda: build_monthly_variation(periodo_counts))
         st.dataframe(display_var_table)
         generate_download_buttons(display_var_table, 'variacion_mensual_total')
         
@@ -606,9 +701,19 @@ with tab1:
             align='center', baseline='middle', dy=alt.expr("datum.Variacion_Cantidad > 0 ? -10 : 15"), color='white'
         ).encode(text='label:N')
         st.altair_chart(bar_chart_var + text_chart_var, use_container_width=True)
+        st.markdown('---')
+
+        # --- Variación Mensual por Categoría ---
+        st.subheader('Variación Mensual por Categoría')
+        cat_variacion = st.selectbox('Seleccionar Categoría:', CATEGORIAS_DESGLOSE, key='cat_selector_variacion')
+        _, display_var_categoria = cached_result(
+            (firma_filtros, 'variacion', cat_variacion), lambda: build_variation(filtered_cube, cat_variacion)
+        )
+        st.dataframe(display_var_categoria, hide_index=True)
+        generate_download_buttons(display_var_categoria, f'variacion_mensual_{cat_variacion.lower()}')
 
 # --- PESTAÑA 2: EDAD Y ANTIGÜEDAD (SIN CAMBIOS) ---
-with tab_edad_antiguedad:
+with tab_edad_antiguedad, profiler.section('pestana_edad_antiguedad', rows_in=len(filtered_df)) as seccion:
     st.header('Análisis de Edad y Antigüedad por Periodo')
     if filtered_df.empty or not selected_periodos:
         st.warning("No hay datos para mostrar con los filtros seleccionados.")
@@ -620,24 +725,24 @@ with tab_edad_antiguedad:
             key='periodo_selector_edad'
         )
         
-        df_periodo_edad = filtered_df[filtered_df['Periodo'] == periodo_a_mostrar_edad]
-        total_empleados_periodo_edad = len(df_periodo_edad)
+        cube_periodo_edad = filtered_cube[filtered_cube['Periodo'] == periodo_a_mostrar_edad]
 
         st.subheader(f'Distribución por Rango de Edad para {periodo_a_mostrar_edad}')
         
+        # Conteos agregados en pandas: el gráfico sólo recibe una fila por grupo
+        edad_chart_counts = cube_counts(cube_periodo_edad, ['Rango Edad', 'Relación'])
+        edad_chart_totals = cube_counts(cube_periodo_edad, 'Rango Edad').rename(columns={'Cantidad': 'total_count'})
+
         # Layer 1: The stacked bars
-        bars_edad = alt.Chart(df_periodo_edad).mark_bar().encode(
+        bars_edad = alt.Chart(edad_chart_counts).mark_bar().encode(
             x=alt.X('Rango Edad:N', sort=all_rangos_edad),
-            y=alt.Y('count():Q', title='Cantidad'),
+            y=alt.Y('Cantidad:Q', title='Cantidad'),
             color='Relación:N',
-            tooltip=['count()', 'Relación']
+            tooltip=['Cantidad', 'Relación']
         )
 
         # Layer 2: The total labels
-        total_labels_edad = alt.Chart(df_periodo_edad).transform_aggregate(
-            total_count='count()',
-            groupby=['Rango Edad']
-        ).mark_text(
+        total_labels_edad = alt.Chart(edad_chart_totals).mark_text(
             dy=-8, # position above bar
             align='center',
             color='black'
@@ -650,34 +755,29 @@ with tab_edad_antiguedad:
         chart_edad_hist = (bars_edad + total_labels_edad).properties(title=f'Distribución por Edad en {periodo_a_mostrar_edad}')
         st.altair_chart(chart_edad_hist, use_container_width=True)
         
-        edad_table = df_periodo_edad.groupby(['Rango Edad', 'Relación']).size().unstack(fill_value=0)
-        edad_table['Total'] = edad_table.sum(axis=1)
-        edad_table['% sobre Total Periodo'] = (edad_table['Total'] / total_empleados_periodo_edad * 100).map('{:.2f}%'.format) if total_empleados_periodo_edad > 0 else '0.00%'
-        edad_table_display = edad_table.reset_index()
-        total_row_edad_values = {col: edad_table_display[col].sum() for col in edad_table_display.columns if col not in ['Rango Edad', '% sobre Total Periodo']}
-        total_row_edad_values['Rango Edad'] = 'Total'
-        total_row_edad_values['% sobre Total Periodo'] = '100.00%'
-        total_row_edad_df = pd.DataFrame([total_row_edad_values])
-        edad_table_with_total = pd.concat([edad_table_display, total_row_edad_df], ignore_index=True)
+        edad_table_with_total = cached_result(
+            (firma_filtros, 'rangos', 'Rango Edad', periodo_a_mostrar_edad), lambda: build_range_table(cube_periodo_edad, 'Rango Edad')
+        )
         st.dataframe(edad_table_with_total)
         generate_download_buttons(edad_table_with_total, f'distribucion_edad_{periodo_a_mostrar_edad}')
         st.markdown('---')
 
         st.subheader(f'Distribución por Rango de Antigüedad para {periodo_a_mostrar_edad}')
         
+        # Conteos agregados en pandas: el gráfico sólo recibe una fila por grupo
+        antiguedad_chart_counts = cube_counts(cube_periodo_edad, ['Rango Antiguedad', 'Relación'])
+        antiguedad_chart_totals = cube_counts(cube_periodo_edad, 'Rango Antiguedad').rename(columns={'Cantidad': 'total_count'})
+
         # Layer 1: The stacked bars
-        bars_antiguedad = alt.Chart(df_periodo_edad).mark_bar().encode(
+        bars_antiguedad = alt.Chart(antiguedad_chart_counts).mark_bar().encode(
             x=alt.X('Rango Antiguedad:N', sort=all_rangos_antiguedad),
-            y=alt.Y('count():Q', title='Cantidad'),
+            y=alt.Y('Cantidad:Q', title='Cantidad'),
             color='Relación:N',
-            tooltip=['count()', 'Relación']
+            tooltip=['Cantidad', 'Relación']
         )
 
         # Layer 2: The total labels
-        total_labels_antiguedad = alt.Chart(df_periodo_edad).transform_aggregate(
-            total_count='count()',
-            groupby=['Rango Antiguedad']
-        ).mark_text(
+        total_labels_antiguedad = alt.Chart(antiguedad_chart_totals).mark_text(
             dy=-8, # position above bar
             align='center',
             color='black'
@@ -690,20 +790,16 @@ with tab_edad_antiguedad:
         chart_antiguedad_hist = (bars_antiguedad + total_labels_antiguedad).properties(title=f'Distribución por Antigüedad en {periodo_a_mostrar_edad}')
         st.altair_chart(chart_antiguedad_hist, use_container_width=True)
 
-        antiguedad_table = df_periodo_edad.groupby(['Rango Antiguedad', 'Relación']).size().unstack(fill_value=0)
-        antiguedad_table['Total'] = antiguedad_table.sum(axis=1)
-        antiguedad_table['% sobre Total Periodo'] = (antiguedad_table['Total'] / total_empleados_periodo_edad * 100).map('{:.2f}%'.format) if total_empleados_periodo_edad > 0 else '0.00%'
-        antiguedad_table_display = antiguedad_table.reset_index()
-        total_row_ant_values = {col: antiguedad_table_display[col].sum() for col in antiguedad_table_display.columns if col not in ['Rango Antiguedad', '% sobre Total Periodo']}
-        total_row_ant_values['Rango Antiguedad'] = 'Total'
-        total_row_ant_values['% sobre Total Periodo'] = '100.00%'
-        total_row_ant_df = pd.DataFrame([total_row_ant_values])
-        antiguedad_table_with_total = pd.concat([antiguedad_table_display, total_row_ant_df], ignore_index=True)
+        antiguedad_table_with_total = cached_result(
+            (firma_filtros, 'rangos', 'Rango Antiguedad', periodo_a_mostrar_edad),
+            lambda: build_range_table(cube_periodo_edad, 'Rango Antiguedad'),
+        )
         st.dataframe(antiguedad_table_with_total)
+        seccion['rows_out'] = len(edad_table_with_total) + len(antiguedad_table_with_total)
         generate_download_buttons(antiguedad_table_with_total, f'distribucion_antiguedad_{periodo_a_mostrar_edad}')
 
 # --- PESTAÑA 3: DESGLOSE (SIN CAMBIOS) ---
-with tab2:
+with tab2, profiler.section('pestana_desglose', rows_in=len(filtered_df)) as seccion:
     st.header('Desglose Detallado por Categoría por Periodo')
     if filtered_df.empty or not selected_periodos:
         st.warning("No hay datos para mostrar con los filtros seleccionados.")
@@ -720,24 +816,42 @@ with tab2:
             )
         
         with col2:
-            categorias = ['Gerencia', 'Ministerio', 'Función', 'Distrito', 'Nivel']
             cat_seleccionada = st.selectbox(
                 'Seleccionar Categoría:',
-                categorias,
+                CATEGORIAS_DESGLOSE,
                 key='cat_selector_desglose'
             )
 
-        df_periodo_desglose = filtered_df[filtered_df['Periodo'] == periodo_a_mostrar_desglose]
-        total_empleados_periodo_desglose = len(df_periodo_desglose)
+        cube_periodo_desglose = filtered_cube[filtered_cube['Periodo'] == periodo_a_mostrar_desglose]
 
         st.subheader(f'Dotación por {cat_seleccionada} para {periodo_a_mostrar_desglose}')
         
+        # Conteos por categoría agregados en pandas (una fila por categoría)
+        desglose_counts = cached_result(
+            (firma_filtros, 'desglose', cat_seleccionada, periodo_a_mostrar_desglose), lambda: cube_counts(cube_periodo_desglose, cat_seleccionada)
+        )
+
+        # El gráfico muestra N valores (ya ordenados en el servidor) y agrupa el resto en 'Otros';
+        # el selector de puestos permite recorrer los valores que quedan dentro de 'Otros'.
+        n_valores = len(desglose_counts)
+        col3, col4 = st.columns(2)
+        with col3:
+            top_n = st.number_input('Valores en el gráfico:', min_value=5, max_value=50, value=DESGLOSE_TOP_N, step=5, key='top_n_desglose')
+        with col4:
+            primer_puesto = st.selectbox(
+                'Mostrar puestos:',
+                list(range(0, n_valores, top_n)) or [0],
+                format_func=lambda inicio: f'{inicio + 1} a {min(inicio + top_n, n_valores)} de {n_valores}',
+                disabled=n_valores <= top_n,
+            )
+        chart_counts = top_n_counts(desglose_counts, cat_seleccionada, top_n, primer_puesto)
+
         # Gráfico ordenado de mayor a menor
-        chart = alt.Chart(df_periodo_desglose).mark_bar().encode(
-            x=alt.X(f'{cat_seleccionada}:N', sort='-y'), # '-y' ordena por el eje Y descendente
-            y=alt.Y('count():Q', title='Cantidad'),
-            color=f'{cat_seleccionada}:N',
-            tooltip=['count()', cat_seleccionada]
+        chart = alt.Chart(chart_counts).mark_bar().encode(
+            x=alt.X(f'{cat_seleccionada}:N', sort=chart_counts[cat_seleccionada].tolist()),
+            y=alt.Y('Cantidad:Q', title='Cantidad'),
+            color=alt.Color(f'{cat_seleccionada}:N', sort=chart_counts[cat_seleccionada].tolist()),
+            tooltip=['Cantidad', cat_seleccionada]
         )
 
         # Etiquetas de datos para el gráfico
@@ -746,33 +860,109 @@ with tab2:
             baseline='middle',
             dy=-10 # Mueve la etiqueta un poco hacia arriba de la barra
         ).encode(
-            text='count():Q'
+            text='Cantidad:Q'
         )
 
         st.altair_chart(chart + text_labels, use_container_width=True)
+        if chart_counts.attrs['otros']:
+            st.caption(f"'Otros' agrupa {chart_counts.attrs['otros']} valores; se ven eligiendo los puestos siguientes.")
         
         # Tabla de datos ordenada de mayor a menor
-        table_data = df_periodo_desglose.groupby(cat_seleccionada).size().reset_index(name='Cantidad')
-        table_data = table_data.sort_values('Cantidad', ascending=False) # Ordena la tabla
-        
-        if total_empleados_periodo_desglose > 0:
-            table_data['%'] = (table_data['Cantidad'] / total_empleados_periodo_desglose * 100).map('{:.2f}%'.format)
-        else:
-            table_data['%'] = '0.00%'
-        
-        total_row = pd.DataFrame({ 
-            cat_seleccionada: ['Total'], 
-            'Cantidad': [table_data['Cantidad'].sum()], 
-            '%': ['100.00%'] 
-        })
-        table_data_with_total = pd.concat([table_data, total_row], ignore_index=True)
+        table_data_with_total = cached_result(
+            (firma_filtros, 'desglose_tabla', cat_seleccionada, periodo_a_mostrar_desglose),
+            lambda: build_breakdown_table(desglose_counts, cat_seleccionada),
+        )
         
         st.dataframe(table_data_with_total)
+        seccion['rows_out'] = len(table_data_with_total)
         generate_download_buttons(table_data_with_total, f'dotacion_{cat_seleccionada.lower()}_{periodo_a_mostrar_desglose}')
 
-# --- PESTAÑA 4: DATOS BRUTOS ---
-with tab3:
-    st.header('Tabla de Datos Filtrados')
-    st.dataframe(filtered_df)
-    generate_download_buttons(filtered_df, 'datos_filtrados_dotacion')
+# --- PESTAÑA 4: ALTAS, BAJAS Y CAMBIOS ---
+with tab_movimientos, profiler.section('pestana_movimientos', rows_in=len(filtered_df)) as seccion:
+    st.header('Altas, Bajas y Cambios entre Periodos')
+    st.caption(
+        'Se comparan los LEGAJOs de cada periodo con los del periodo anterior dentro de la dotación filtrada: '
+        f"quien sale del filtro figura como baja. Los cambios son de {', '.join(MOVEMENT_COLUMNS)}."
+    )
+    if filtered_df.empty or len(selected_periodos) < 2:
+        st.warning("Selecciona al menos dos periodos con datos para ver los movimientos.")
+    else:
+        movimientos = cached_result((firma_filtros, 'movimientos'), lambda: compute_movements(filtered_df))
+        resumen_movimientos = cached_result((firma_filtros, 'movimientos_resumen'), lambda: summarize_movements(movimientos))
+        seccion['rows_out'] = len(movimientos)
 
+        if resumen_movimientos.empty:
+            st.warning("Los periodos seleccionados no tienen datos para comparar.")
+        else:
+            st.subheader('Resumen de Movimientos por Periodo')
+            chart_movimientos = resumen_movimientos.assign(Bajas=-resumen_movimientos['Bajas']).melt(
+                id_vars='Periodo', value_vars=['Altas', 'Bajas'], var_name='Movimiento', value_name='Cantidad'
+            )
+            bar_chart_mov = alt.Chart(chart_movimientos).mark_bar().encode(
+                x=alt.X('Periodo:N', sort=all_periodos, title='Periodo'),
+                y=alt.Y('Cantidad:Q', title='Empleados'),
+                color=alt.Color('Movimiento:N', scale=alt.Scale(domain=['Altas', 'Bajas'], range=['green', 'red'])),
+                tooltip=['Periodo', 'Movimiento', 'Cantidad']
+            )
+            st.altair_chart(bar_chart_mov, use_container_width=True)
+            st.dataframe(resumen_movimientos, hide_index=True)
+            generate_download_buttons(resumen_movimientos, 'resumen_movimientos')
+            st.markdown('---')
+
+            st.subheader('Detalle de Movimientos')
+            col_mov_periodo, col_mov_tipo = st.columns(2)
+            with col_mov_periodo:
+                periodo_movimientos = st.selectbox(
+                    'Seleccionar Periodo:',
+                    resumen_movimientos['Periodo'].tolist(),
+                    index=len(resumen_movimientos) - 1,
+                    key='periodo_selector_movimientos'
+                )
+            with col_mov_tipo:
+                tipos_movimiento = st.multiselect('Tipo de movimiento:', TIPOS_MOVIMIENTO, default=TIPOS_MOVIMIENTO, key='tipo_movimientos')
+            detalle_movimientos = movimientos[
+                (movimientos['Periodo'] == periodo_movimientos) & movimientos['Movimiento'].isin(tipos_movimiento)
+            ]
+            st.dataframe(detalle_movimientos, hide_index=True)
+            generate_download_buttons(movimientos, 'movimientos_dotacion', streaming=True)
+
+# --- PESTAÑA 5: DATOS BRUTOS ---
+with tab3, profiler.section('pestana_datos_brutos', rows_in=len(filtered_df)) as seccion:
+    st.header('Tabla de Datos Filtrados')
+    col_busqueda, col_orden, col_sentido, col_tamano = st.columns([3, 2, 1, 1])
+    with col_busqueda:
+        texto_busqueda = st.text_input('Buscar por Legajo o dimensión:', key='raw_search')
+    with col_orden:
+        columna_orden = st.selectbox('Ordenar por:', ['(sin orden)'] + list(filtered_df.columns), key='raw_sort_column')
+    with col_sentido:
+        sentido_orden = st.radio('Sentido:', ['Ascendente', 'Descendente'], key='raw_sort_direction')
+    with col_tamano:
+        filas_por_pagina = st.selectbox('Filas por página:', PAGE_SIZE_OPTIONS, index=2, key='raw_page_size')
+
+    raw_view_df = search_rows(filtered_df, texto_busqueda)
+    seccion['rows_out'] = len(raw_view_df)
+    total_paginas = max(1, -(-len(raw_view_df) // filas_por_pagina))
+    # Si cambió la búsqueda o los filtros, la página guardada puede quedar fuera de rango.
+    if st.session_state.get('raw_page', 1) > total_paginas:
+        st.session_state['raw_page'] = total_paginas
+    pagina = st.number_input(f'Página (de {total_paginas}):', min_value=1, max_value=total_paginas, step=1, key='raw_page')
+
+    raw_page_df = get_page(
+        raw_view_df,
+        pagina - 1,
+        filas_por_pagina,
+        sort_column=None if columna_orden == '(sin orden)' else columna_orden,
+        ascending=sentido_orden == 'Ascendente',
+    )
+    st.dataframe(raw_page_df)
+    if raw_view_df.empty:
+        st.caption('No hay filas que coincidan con la búsqueda.')
+    else:
+        primera_fila = (pagina - 1) * filas_por_pagina + 1
+        st.caption(f'Mostrando filas {primera_fila}–{primera_fila + len(raw_page_df) - 1} de {len(raw_view_df)}.')
+    generate_download_buttons(filtered_df, 'datos_filtrados_dotacion', streaming=True)
+
+# --- Instrumentación (opcional) ---
+profile_entry = profiler.finish(version=dataset.version, filas_filtradas=len(filtered_df), cache_resultados=refresher.result_cache.stats())
+if profile_entry:
+    render_profile_panel(profile_entry, profiler.downloads)
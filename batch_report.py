@@ -0,0 +1,177 @@
+"""Generación por lotes, sin interfaz, de las tablas del dashboard para el cierre de mes.
+
+Calcula para todos los periodos las mismas tablas que muestra app.py: totales por
+periodo, distribuciones por Sexo y Relación, variación mensual (total y por
+categoría), tablas de Edad y Antigüedad y el desglose por cada categoría. Los
+trabajos (periodo x categoría) se reparten entre un pool de procesos; cada proceso
+recibe el cubo de conteos una sola vez al iniciarse. El resultado es un CSV
+consolidado por tabla y un Excel con una hoja por tabla.
+
+Uso:
+    python batch_report.py --output-dir reportes
+    python batch_report.py --periodos "Enero 2025" "Febrero 2025" --workers 4
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from dotacion_data import (
+    CATEGORIAS_DESGLOSE,
+    DIMENSION_COLUMNS,
+    DataLoadError,
+    HeadcountCube,
+    build_breakdown_table,
+    build_monthly_variation,
+    build_period_pivot,
+    build_range_table,
+    build_variation,
+    cube_counts,
+    get_sorted_unique_options,
+    load_clean_dataset,
+    serialize_table_bytes,
+)
+
+DEFAULT_EXCEL_URL = 'https://raw.githubusercontent.com/Tincho2002/dotacion_assa_2025/main/Dotacion_25.xlsx'
+
+# Tablas que abarcan todos los periodos y tablas que se calculan para cada periodo.
+TABLAS_GLOBALES = ['Periodo', 'Sexo', 'Relación', 'Variación'] + [f'Variación {cat}' for cat in CATEGORIAS_DESGLOSE]
+TABLAS_POR_PERIODO = ['Rango Edad', 'Rango Antiguedad'] + CATEGORIAS_DESGLOSE
+
+# Nombre de archivo (igual al de las descargas del dashboard) y nombre de hoja de cada tabla.
+NOMBRES_TABLAS = {
+    'Periodo': ('dotacion_total_por_periodo', 'Total por Periodo'),
+    'Sexo': ('distribucion_sexo_por_periodo', 'Sexo por Periodo'),
+    'Relación': ('distribucion_relacion_por_periodo', 'Relación por Periodo'),
+    'Variación': ('variacion_mensual_total', 'Variación Mensual'),
+    'Rango Edad': ('distribucion_edad', 'Edad'),
+    'Rango Antiguedad': ('distribucion_antiguedad', 'Antigüedad'),
+    **{f'Variación {cat}': (f'variacion_mensual_{cat.lower()}', f'Variación {cat}') for cat in CATEGORIAS_DESGLOSE},
+    **{cat: (f'dotacion_{cat.lower()}', f'Desglose {cat}') for cat in CATEGORIAS_DESGLOSE},
+}
+
+# Conteos del cubo, cargados una vez por proceso del pool.
+_cube_counts = None
+
+
+def init_worker(counts):
+    global _cube_counts
+    _cube_counts = counts
+
+
+def run_job(job):
+    """Calcula una tabla: global si el periodo es None, o la de un periodo en particular."""
+    periodo, tabla = job
+    counts = _cube_counts
+    if periodo is None:
+        if tabla == 'Periodo':
+            return job, cube_counts(counts, 'Periodo')
+        if tabla == 'Variación':
+            _, display_var_table = build_monthly_variation(cube_counts(counts, 'Periodo'))
+            return job, display_var_table
+        if tabla.startswith('Variación '):
+            _, display_var_table = build_variation(counts, tabla.removeprefix('Variación '))
+            return job, display_var_table
+        return job, build_period_pivot(cube_counts(counts, ['Periodo', tabla]), tabla)
+
+    cube_periodo = counts[counts['Periodo'] == periodo]
+    if tabla in ('Rango Edad', 'Rango Antiguedad'):
+        table = build_range_table(cube_periodo, tabla)
+    else:
+        table = build_breakdown_table(cube_counts(cube_periodo, tabla), tabla)
+    table.insert(0, 'Periodo', periodo)
+    return job, table
+
+
+def build_jobs(periodos):
+    return [(None, tabla) for tabla in TABLAS_GLOBALES] + [
+        (periodo, tabla) for periodo in periodos for tabla in TABLAS_POR_PERIODO
+    ]
+
+
+def run_jobs(counts, jobs, workers):
+    """Ejecuta los trabajos en un pool de procesos (o en este proceso si workers es 1)."""
+    if workers <= 1:
+        init_worker(counts)
+        return dict(map(run_job, jobs))
+    chunksize = max(1, math.ceil(len(jobs) / (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(counts,)) as executor:
+        return dict(executor.map(run_job, jobs, chunksize=chunksize))
+
+
+def consolidate(results, jobs):
+    """Une los resultados de cada tabla en un único DataFrame, en el orden de los periodos."""
+    consolidated = {}
+    for tabla in TABLAS_GLOBALES + TABLAS_POR_PERIODO:
+        partes = [results[job] for job in jobs if job[1] == tabla]
+        if partes:
+            consolidated[tabla] = pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+    return consolidated
+
+
+def write_outputs(consolidated, output_dir, write_xlsx=True):
+    output_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for tabla, table in consolidated.items():
+        csv_path = output_dir / f'{NOMBRES_TABLAS[tabla][0]}.csv'
+        csv_path.write_text(serialize_table_bytes(table, 'csv'), encoding='utf-8')
+        written.append(csv_path)
+    if write_xlsx:
+        xlsx_path = output_dir / 'reporte_dotacion.xlsx'
+        with pd.ExcelWriter(xlsx_path, engine='openpyxl') as writer:
+            for tabla, table in consolidated.items():
+                table.to_excel(writer, sheet_name=NOMBRES_TABLAS[tabla][1], index=False)
+        written.append(xlsx_path)
+    return written
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', nargs='+', default=os.environ.get('DOTACION_EXCEL_URL', DEFAULT_EXCEL_URL).split(),
+                        help='URL de cada libro anual (por defecto, DOTACION_EXCEL_URL o la del repositorio).')
+    parser.add_argument('--output-dir', default='reportes', help='Directorio donde se escriben los archivos.')
+    parser.add_argument('--periodos', nargs='+', help='Periodos a incluir (por defecto, todos).')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Procesos del pool (1 = sin pool).')
+    parser.add_argument('--no-xlsx', action='store_true', help='Escribir sólo los CSV.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    try:
+        df = load_clean_dataset(args.url)
+    except DataLoadError as e:
+        print(f"ERROR CRÍTICO: {e}", file=sys.stderr)
+        return 1
+
+    periodos = get_sorted_unique_options(df, 'Periodo')
+    if args.periodos:
+        faltantes = sorted(set(args.periodos) - set(periodos))
+        if faltantes:
+            print(f"Periodos sin datos: {', '.join(faltantes)}", file=sys.stderr)
+            return 1
+        periodos = [periodo for periodo in periodos if periodo in args.periodos]
+
+    counts = HeadcountCube(df, DIMENSION_COLUMNS).counts
+    if args.periodos:
+        counts = counts[counts['Periodo'].isin(periodos)]
+    jobs = build_jobs(periodos)
+    workers = max(1, min(args.workers, len(jobs)))
+    results = run_jobs(counts, jobs, workers)
+    written = write_outputs(consolidate(results, jobs), Path(args.output_dir), write_xlsx=not args.no_xlsx)
+
+    print(f"{len(jobs)} tablas de {len(periodos)} periodos con {workers} procesos "
+          f"en {time.perf_counter() - start:.2f}s:", file=sys.stderr)
+    for path in written:
+        print(f"  {path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""Benchmark sin interfaz del pipeline de carga, filtrado, agregación y exportación.
+
+Genera planillas sintéticas con la forma de la hoja 'Dotacion_25' (mismas columnas,
+12 periodos y cardinalidades realistas) y mide, para cada tamaño, la latencia y el
+pico de memoria de cada etapa. El informe se escribe en JSON para poder compararlo
+entre versiones y detectar regresiones.
+
+Uso:
+    python benchmark.py --sizes 10000 100000 --output bench.json
+    python benchmark.py --sizes 10000 --compare bench.json --threshold 1.25
+
+Excel admite como máximo 1.048.576 filas por hoja: por encima de --max-workbook-rows
+no se escribe la planilla y la etapa de carga mide la limpieza del DataFrame crudo en
+memoria (etapa 'clean_cold' en lugar de 'load_cold').
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+EXCEL_MAX_ROWS = 1_048_575
+
+# Cardinalidades aproximadas de la dotación real.
+N_GERENCIAS = 14
+N_FUNCIONES = 350
+N_DISTRITOS = 12
+N_MINISTERIOS = 4
+N_NIVELES = 9
+
+
+def skewed_choice(rng, values, size, exponent=0.8):
+    """Elige valores con una distribución sesgada (pocos valores muy frecuentes)."""
+    weights = 1.0 / np.arange(1, len(values) + 1) ** exponent
+    return rng.choice(np.asarray(values, dtype=object), size=size, p=weights / weights.sum())
+
+
+def generate_dotacion(n_rows, n_periods=12, year=2025, seed=0):
+    """DataFrame crudo con la forma de la hoja 'Dotacion_25'.
+
+    Cada periodo toma una ventana deslizante de un padrón de empleados, de modo que
+    entre meses consecutivos hay altas y bajas.
+    """
+    rng = np.random.default_rng(seed)
+    per_period = -(-n_rows // n_periods)
+    n_employees = int(per_period * 1.1) + 1
+    employees = pd.DataFrame({
+        'LEGAJO': np.arange(10_000, 10_000 + n_employees),
+        'Gerencia': skewed_choice(rng, [f'Gerencia {i:02d}' for i in range(N_GERENCIAS)], n_employees),
+        'Relación': rng.choice(np.array(['Convenio', 'FC'], dtype=object), n_employees, p=[0.97, 0.03]),
+        'Sexo': rng.choice(np.array(['Masculino', 'Femenino'], dtype=object), n_employees, p=[0.74, 0.26]),
+        'Función': skewed_choice(rng, [f'Función {i:03d}' for i in range(N_FUNCIONES)], n_employees),
+        'Distrito': skewed_choice(rng, [f'Distrito {i:02d}' for i in range(N_DISTRITOS)], n_employees),
+        'Ministerio': skewed_choice(rng, [f'Ministerio {i}' for i in range(N_MINISTERIOS)], n_employees),
+        'Nivel': skewed_choice(rng, [f'Nivel {i}' for i in range(N_NIVELES)], n_employees, exponent=0.3),
+        'Fecha ing.': pd.Timestamp('1985-01-01') + pd.to_timedelta(rng.integers(0, 14_600, n_employees), unit='D'),
+        'Fecha Nac.': pd.Timestamp('1958-01-01') + pd.to_timedelta(rng.integers(0, 16_000, n_employees), unit='D'),
+    })
+
+    step = (n_employees - per_period) // max(n_periods - 1, 1)
+    positions = np.concatenate([np.arange(p * step, p * step + per_period) for p in range(n_periods)])
+    periodos = np.repeat([pd.Timestamp(year, month, 1) for month in range(1, n_periods + 1)], per_period)
+    df_raw = employees.iloc[positions].reset_index(drop=True)
+    df_raw['Periodo'] = periodos
+    df_raw['Rango (Antigüedad)'] = None
+    df_raw['Rango (Edad)'] = None
+    return df_raw.iloc[:n_rows].copy()
+
+
+def measure(stage, func, repeat=1, setup=None, track_memory=True, rows_in=None):
+    """Ejecuta una etapa `repeat` veces y una vez más bajo tracemalloc para el pico de memoria."""
+    seconds = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+
+    peak_bytes = None
+    if track_memory:
+        if setup is not None:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    record = {
+        'stage': stage,
+        'seconds_min': min(seconds),
+        'seconds_median': statistics.median(seconds),
+        'repeat': repeat,
+        'peak_mb': None if peak_bytes is None else round(peak_bytes / 2**20, 3),
+        'rows_in': rows_in,
+        'rows_out': len(result) if hasattr(result, '__len__') and not isinstance(result, (str, bytes)) else None,
+    }
+    memory = '' if peak_bytes is None else f"{record['peak_mb']:>9.1f} MB"
+    print(f"  {stage:<22} {record['seconds_min'] * 1000:>11.1f} ms  {memory}", file=sys.stderr)
+    return record, result
+
+
+def run_size(n_rows, args, work_dir):
+    """Corre todas las etapas para un tamaño de dotación y devuelve sus registros."""
+    import dotacion_data as dd
+
+    print(f'\n== {n_rows:,} filas ==', file=sys.stderr)
+    records = []
+    start = time.perf_counter()
+    df_raw = generate_dotacion(n_rows, n_periods=args.periods, seed=args.seed)
+    generate_seconds = time.perf_counter() - start
+
+    def clear_cache():
+        shutil.rmtree(dd.SNAPSHOT_DIR, ignore_errors=True)
+
+    def clear_exports():
+        shutil.rmtree(dd.SNAPSHOT_DIR / 'exports', ignore_errors=True)
+
+    track = not args.no_memory
+    workbook_path = None
+    if n_rows <= args.max_workbook_rows:
+        workbook_path = os.path.join(work_dir, f'dotacion_{n_rows}.xlsx')
+        start = time.perf_counter()
+        with open(workbook_path, 'wb') as destination:
+            dd.write_xlsx_stream(df_raw, destination, sheet_name='Dotacion_25')
+        generate_seconds += time.perf_counter() - start
+
+        record, df = measure('load_cold', lambda: dd.load_clean_dataset(workbook_path), args.repeat_load,
+                             setup=clear_cache, track_memory=track, rows_in=n_rows)
+        records.append(record)
+        record, df = measure('load_warm', lambda: dd.load_clean_dataset(workbook_path), args.repeat,
+                             track_memory=track, rows_in=n_rows)
+        records.append(record)
+    else:
+        record, df = measure('clean_cold', lambda: dd.clean_by_partition([(df_raw.copy(), 2025)]), args.repeat_load,
+                             setup=clear_cache, track_memory=track, rows_in=n_rows)
+        records.append(record)
+        snapshot_path = dd.SNAPSHOT_DIR / 'benchmark.parquet'
+        dd.write_snapshot(df, snapshot_path)
+        record, df = measure('load_warm', lambda: dd.read_snapshot(snapshot_path), args.repeat,
+                             track_memory=track, rows_in=n_rows)
+        records.append(record)
+    df_raw = None
+
+    record, filter_index = measure('build_filter_index', lambda: dd.BitmapFilterIndex(df, dd.DIMENSION_COLUMNS, dd.YEAR_COLUMN),
+                                   args.repeat_load, track_memory=track, rows_in=len(df))
+    records.append(record)
+    record, cube = measure('build_cube', lambda: dd.HeadcountCube(df, dd.DIMENSION_COLUMNS, dd.YEAR_COLUMN),
+                           args.repeat_load, track_memory=track, rows_in=len(df))
+    records.append(record)
+    record, catalog = measure('build_catalog', lambda: dd.DimensionCatalog(df, dd.DIMENSION_COLUMNS, [(dd.YEAR_COLUMN, 'Periodo')]),
+                              args.repeat_load, track_memory=track, rows_in=len(df))
+    records.append(record)
+
+    # Selecciones: todo seleccionado (valor por defecto) y una selección típica más acotada.
+    all_selected = {col: catalog.options(col) for col in dd.DIMENSION_COLUMNS}
+    selective = dict(all_selected)
+    selective['Gerencia'] = all_selected['Gerencia'][: max(1, len(all_selected['Gerencia']) // 2)]
+    selective['Sexo'] = all_selected['Sexo'][:1]
+    selective['Periodo'] = all_selected['Periodo'][1:] or all_selected['Periodo']
+
+    record, _ = measure('filter_default', lambda: filter_index.apply(df, all_selected), args.repeat,
+                        track_memory=track, rows_in=len(df))
+    records.append(record)
+    record, filtered_df = measure('filter_selective', lambda: filter_index.apply(df, selective), args.repeat,
+                                  track_memory=track, rows_in=len(df))
+    records.append(record)
+    record, filtered_cube = measure('filter_cube', lambda: cube.filter(selective), args.repeat,
+                                    track_memory=track, rows_in=len(cube.counts))
+    records.append(record)
+    # Conteos facetados desde cero (sin el estado incremental de una sesión).
+    record, _ = measure('facet_counts', lambda: dd.FacetCounter(cube, {dd.YEAR_COLUMN: ['Periodo']}).update(selective),
+                        args.repeat, track_memory=track, rows_in=len(cube.counts))
+    records.append(record)
+
+    latest_period = selective['Periodo'][-1]
+    cube_latest = filtered_cube[filtered_cube['Periodo'] == latest_period]
+
+    def tab_resumen():
+        periodo_counts = dd.cube_counts(filtered_cube, 'Periodo')
+        sexo_pivot = dd.build_period_pivot(dd.cube_counts(filtered_cube, ['Periodo', 'Sexo']), 'Sexo')
+        relacion_pivot = dd.build_period_pivot(dd.cube_counts(filtered_cube, ['Periodo', 'Relación']), 'Relación')
+        _, variacion = dd.build_monthly_variation(periodo_counts)
+        return [periodo_counts, sexo_pivot, relacion_pivot, variacion]
+
+    def tab_edad_antiguedad():
+        return [dd.build_range_table(cube_latest, 'Rango Edad'), dd.build_range_table(cube_latest, 'Rango Antiguedad')]
+
+    def tab_desglose():
+        # Tabla completa (la que se exporta) y datos del gráfico top-N de cada categoría.
+        tablas = []
+        for cat in dd.CATEGORIAS_DESGLOSE:
+            conteos = dd.cube_counts(cube_latest, cat)
+            dd.top_n_counts(conteos, cat)
+            tablas.append(dd.build_breakdown_table(conteos, cat))
+        return tablas
+
+    tables = []
+    for stage, func in [('tab_resumen', tab_resumen), ('tab_edad_antiguedad', tab_edad_antiguedad), ('tab_desglose', tab_desglose)]:
+        record, result = measure(stage, func, args.repeat, track_memory=track, rows_in=len(filtered_cube))
+        records.append(record)
+        tables.extend(result)
+
+    record, _ = measure('resumen_kpis', lambda: dd.compute_kpis(filtered_cube, selective['Periodo']), args.repeat,
+                        track_memory=track, rows_in=len(filtered_cube))
+    records.append(record)
+    record, _ = measure('tab_movimientos', lambda: dd.summarize_movements(dd.compute_movements(filtered_df)), args.repeat,
+                        track_memory=track, rows_in=len(filtered_df))
+    records.append(record)
+
+    def export_tables():
+        return [dd.serialize_table_bytes(table, file_format) for table in tables for file_format in ('csv', 'xlsx')]
+
+    record, _ = measure('export_tables', export_tables, args.repeat, track_memory=track, rows_in=len(tables))
+    records.append(record)
+
+    def export_raw(file_format):
+        dd.export_table_streaming(filtered_df, file_format)
+
+    record, _ = measure('export_raw_csv', lambda: export_raw('csv'), args.repeat_load, setup=clear_exports,
+                        track_memory=track, rows_in=len(filtered_df))
+    records.append(record)
+    if len(filtered_df) <= EXCEL_MAX_ROWS:
+        record, _ = measure('export_raw_xlsx', lambda: export_raw('xlsx'), args.repeat_load, setup=clear_exports,
+                            track_memory=track, rows_in=len(filtered_df))
+        records.append(record)
+
+    clear_cache()
+    return {
+        'rows': n_rows,
+        'rows_filtered': len(filtered_df),
+        'cube_cells': len(cube.counts),
+        'workbook': workbook_path is not None,
+        'generate_seconds': round(generate_seconds, 3),
+        'stages': records,
+    }
+
+
+def compare_reports(current, baseline, threshold, min_seconds):
+    """Lista de etapas cuya latencia empeoró más que `threshold` veces respecto de la base."""
+    base_stages = {
+        (result['rows'], stage['stage']): stage
+        for result in baseline.get('results', [])
+        for stage in result['stages']
+    }
+    regressions = []
+    for result in current['results']:
+        for stage in result['stages']:
+            base = base_stages.get((result['rows'], stage['stage']))
+            if base is None or base['seconds_min'] < min_seconds:
+                continue
+            ratio = stage['seconds_min'] / base['seconds_min']
+            if ratio > threshold:
+                regressions.append({
+                    'rows': result['rows'],
+                    'stage': stage['stage'],
+                    'baseline_seconds': base['seconds_min'],
+                    'seconds': stage['seconds_min'],
+                    'ratio': round(ratio, 3),
+                })
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 5_000_000],
+                        help='Cantidades de filas a generar (por defecto: 10k 100k 1M 5M).')
+    parser.add_argument('--periods', type=int, default=12, help='Periodos mensuales por planilla.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones de las etapas rápidas.')
+    parser.add_argument('--repeat-load', type=int, default=1, help='Repeticiones de las etapas lentas (carga, índices, exportación en streaming).')
+    parser.add_argument('--max-workbook-rows', type=int, default=EXCEL_MAX_ROWS,
+                        help='Tamaño máximo para el que se escribe y se lee una planilla real.')
+    parser.add_argument('--no-memory', action='store_true', help='No medir el pico de memoria (evita la pasada con tracemalloc).')
+    parser.add_argument('--output', help='Archivo JSON de salida (por defecto, la salida estándar).')
+    parser.add_argument('--compare', help='Informe JSON de referencia para detectar regresiones.')
+    parser.add_argument('--threshold', type=float, default=1.25, help='Cociente de latencia a partir del cual una etapa es regresión.')
+    parser.add_argument('--min-seconds', type=float, default=0.005, help='Las etapas más rápidas que esto en la base no se comparan.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    work_dir = tempfile.mkdtemp(prefix='dotacion_bench_')
+    # El caché de snapshots del benchmark no debe mezclarse con el de la aplicación.
+    os.environ['DOTACION_CACHE_DIR'] = os.path.join(work_dir, 'cache')
+    try:
+        report = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+            },
+            'config': {
+                'periods': args.periods,
+                'seed': args.seed,
+                'repeat': args.repeat,
+                'repeat_load': args.repeat_load,
+                'max_workbook_rows': args.max_workbook_rows,
+                'memory': not args.no_memory,
+            },
+            'results': [run_size(n_rows, args, work_dir) for n_rows in args.sizes],
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        report['regressions'] = compare_reports(report, baseline, args.threshold, args.min_seconds)
+        for regression in report['regressions']:
+            print(f"REGRESIÓN {regression['rows']:,} filas / {regression['stage']}: "
+                  f"{regression['baseline_seconds']:.3f}s -> {regression['seconds']:.3f}s (x{regression['ratio']})",
+                  file=sys.stderr)
+        exit_code = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1508 @@
+"""Carga, limpieza y agregación de los datos de dotación.
+
+No depende de Streamlit: lo usan tanto el dashboard (app.py) como los scripts de
+línea de comandos.
+"""
+import io
+import os
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+import tempfile
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+# --- Snapshot columnar de los datos limpios ---
+# Directorio donde se guardan los snapshots Parquet del DataFrame ya limpio.
+SNAPSHOT_DIR = Path(os.environ.get('DOTACION_CACHE_DIR', Path(__file__).resolve().parent / '.cache'))
+# Incrementar cuando cambie la lógica de limpieza para invalidar snapshots viejos.
+SNAPSHOT_VERSION = 6
+SNAPSHOT_PREFIX = 'dotacion_25'
+# Particiones limpias por Periodo, para la ingesta incremental de cada mes.
+PARTITION_DIR = SNAPSHOT_DIR / 'periodos'
+PARTITION_PREFIX = 'periodo'
+
+# --- Descarga con espejo local ---
+# Copia local del Excel remoto y sus validadores HTTP (ETag / Last-Modified).
+MIRROR_DIR = SNAPSHOT_DIR / 'espejo'
+# Segundos durante los que el espejo se usa sin consultar al servidor.
+FETCH_REFRESH_TTL = float(os.environ.get('DOTACION_REFRESH_TTL', 15 * 60))
+# Segundos de espera máxima de la red antes de servir el espejo.
+FETCH_TIMEOUT = float(os.environ.get('DOTACION_FETCH_TIMEOUT', 10))
+
+# --- Fuentes anuales ---
+# Cada libro puede traer una o más hojas anuales: 'Dotacion_25', 'Dotacion_2024', ...
+YEAR_SHEET_PATTERN = re.compile(r'^Dotacion_(\d{2}|\d{4})$')
+# Hilos para descargar los libros y leer sus hojas en paralelo.
+LOAD_WORKERS = int(os.environ.get('DOTACION_LOAD_WORKERS', 4))
+# Columnas de las hojas que usa el dashboard; las demás no se leen (tampoco en Datos Brutos).
+SOURCE_COLUMNS = [
+    'LEGAJO', 'Gerencia', 'Relación', 'Sexo', 'Función', 'Distrito', 'Ministerio', 'Nivel',
+    'Fecha ing.', 'Fecha Nac.', 'Periodo', 'Año', 'Rango (Antigüedad)', 'Rango (Edad)',
+]
+SOURCE_DATE_COLUMNS = ['Fecha ing.', 'Fecha Nac.']
+# Filas que se acumulan como objetos Python antes de pasarlas a columnas compactas.
+READ_CHUNK_ROWS = int(os.environ.get('DOTACION_READ_CHUNK_ROWS', 20_000))
+
+# --- Carga en segundo plano ---
+# Segundos entre recargas programadas del dataset.
+RELOAD_INTERVAL = float(os.environ.get('DOTACION_RELOAD_INTERVAL', 15 * 60))
+# Segundos antes de reintentar cuando todavía no se pudo publicar ninguna versión.
+RELOAD_RETRY_DELAY = float(os.environ.get('DOTACION_RELOAD_RETRY_DELAY', 60))
+
+# --- Caché de resultados ---
+# Memoria máxima (MB) de los resultados compartidos entre sesiones.
+RESULT_CACHE_MAX_MB = float(os.environ.get('DOTACION_RESULT_CACHE_MB', 128))
+
+def get_mirror_paths(url):
+    """Rutas del espejo local (contenido y metadatos) de una URL."""
+    clave = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+    return MIRROR_DIR / f'{clave}.xlsx', MIRROR_DIR / f'{clave}.json'
+
+def read_mirror_meta(meta_path):
+    """Lee los metadatos del espejo; devuelve None si no existen o están dañados."""
+    try:
+        return json.loads(meta_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+def write_mirror(mirror_path, meta_path, contenido, meta):
+    """Guarda el espejo y sus metadatos de forma atómica."""
+    try:
+        MIRROR_DIR.mkdir(parents=True, exist_ok=True)
+        if contenido is not None:
+            tmp_path = mirror_path.with_suffix('.tmp')
+            tmp_path.write_bytes(contenido)
+            os.replace(tmp_path, mirror_path)
+        tmp_meta_path = meta_path.with_suffix('.json.tmp')
+        tmp_meta_path.write_text(json.dumps(meta), encoding='utf-8')
+        os.replace(tmp_meta_path, meta_path)
+    except OSError:
+        pass
+
+def fetch_workbook_bytes(url):
+    """Devuelve el contenido del Excel, usando el espejo local siempre que sea posible.
+
+    - Si el espejo se validó hace menos de FETCH_REFRESH_TTL segundos, no se usa la red.
+    - Si no, se hace un GET condicional (If-None-Match / If-Modified-Since); ante un 304
+      se sirve el espejo sin volver a descargar.
+    - Si la red falla o supera FETCH_TIMEOUT, se sirve el espejo (aunque esté vencido).
+
+    Las rutas locales se leen directamente.
+    """
+    if os.path.exists(url):
+        return Path(url).read_bytes()
+
+    mirror_path, meta_path = get_mirror_paths(url)
+    meta = read_mirror_meta(meta_path)
+    has_mirror = meta is not None and mirror_path.exists()
+    if has_mirror and time.time() - meta.get('validated_at', 0) < FETCH_REFRESH_TTL:
+        return mirror_path.read_bytes()
+
+    request = urllib.request.Request(url)
+    if has_mirror:
+        if meta.get('etag'):
+            request.add_header('If-None-Match', meta['etag'])
+        if meta.get('last_modified'):
+            request.add_header('If-Modified-Since', meta['last_modified'])
+    try:
+        with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+            contenido = response.read()
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+    except urllib.error.HTTPError as e:
+        if not has_mirror:
+            raise
+        if e.code == 304:
+            meta['validated_at'] = time.time()
+            write_mirror(mirror_path, meta_path, None, meta)
+        return mirror_path.read_bytes()
+    except OSError:
+        # Sin red o con la red lenta (URLError y los timeouts son OSError): se usa el espejo.
+        if not has_mirror:
+            raise
+        return mirror_path.read_bytes()
+
+    write_mirror(mirror_path, meta_path, contenido, {
+        'url': url,
+        'etag': etag,
+        'last_modified': last_modified,
+        'validated_at': time.time(),
+    })
+    return contenido
+
+def get_snapshot_path(contenidos):
+    """Ruta del snapshot Parquet correspondiente al hash del contenido de los Excel de origen."""
+    hasher = hashlib.sha256()
+    for contenido in contenidos:
+        hasher.update(hashlib.sha256(contenido).digest())
+    clave = hasher.hexdigest()[:20]
+    return SNAPSHOT_DIR / f'{SNAPSHOT_PREFIX}_{clave}_v{SNAPSHOT_VERSION}.parquet'
+
+def normalize_for_snapshot(df_clean):
+    """Convierte a texto las columnas con tipos mezclados, que Parquet no puede almacenar."""
+    for col in df_clean.columns:
+        if df_clean[col].dtype == object and pd.api.types.infer_dtype(df_clean[col], skipna=True).startswith('mixed'):
+            df_clean[col] = df_clean[col].astype(str).where(df_clean[col].notna())
+    return df_clean
+
+def read_snapshot(snapshot_path):
+    """Lee el snapshot Parquet si existe; devuelve None si no existe o está dañado."""
+    if not snapshot_path.exists():
+        return None
+    try:
+        return pd.read_parquet(snapshot_path)
+    except Exception:
+        return None
+
+def write_snapshot(df_clean, snapshot_path):
+    """Guarda el snapshot de forma atómica."""
+    try:
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = snapshot_path.with_suffix('.tmp')
+        df_clean.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, snapshot_path)
+    except Exception:
+        # El snapshot es sólo una optimización: si no se puede escribir, se sigue sin él.
+        pass
+
+def remove_stale_snapshots(directory, prefix, keep):
+    """Elimina los snapshots con el prefijo indicado que no estén en `keep`."""
+    try:
+        for old_snapshot in directory.glob(f'{prefix}_*.parquet'):
+            if old_snapshot not in keep:
+                old_snapshot.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+def get_partition_path(df_raw_partition, anio=None):
+    """Ruta de la partición limpia correspondiente al hash de las filas crudas de un periodo."""
+    hasher = hashlib.sha256()
+    hasher.update(repr((anio, list(df_raw_partition.columns))).encode('utf-8'))
+    hasher.update(pd.util.hash_pandas_object(df_raw_partition, index=False).to_numpy().tobytes())
+    return PARTITION_DIR / f'{PARTITION_PREFIX}_{hasher.hexdigest()[:20]}_v{SNAPSHOT_VERSION}.parquet'
+
+def concat_partitions(partitions):
+    """Une las particiones limpias conservando las dimensiones como Categorical ordenados.
+
+    Las demás columnas categóricas (las crudas, como 'Rango (Edad)') también se unen
+    como Categorical: `pd.concat` las pasaría a object cuando las particiones traen
+    categorías distintas, que es lo habitual al combinar particiones leídas de disco.
+    """
+    if len(partitions) == 1:
+        return partitions[0]
+    df_concat = pd.concat(partitions, ignore_index=True)
+    for col in df_concat.columns:
+        partes = [part[col] for part in partitions]
+        if not all(isinstance(parte.dtype, pd.CategoricalDtype) for parte in partes):
+            continue
+        if col in DIMENSION_COLUMNS:
+            union = pd.api.types.union_categoricals(partes, ignore_order=True)
+            categorias = sort_dimension_values(union.categories.tolist(), col)
+            df_concat[col] = pd.Categorical(union.set_categories(categorias), ordered=True)
+        else:
+            # Las particiones leídas de Parquet traen categorías str y las recién limpiadas, object.
+            partes = [parte.cat.rename_categories(parte.cat.categories.astype(object)) for parte in partes]
+            df_concat[col] = pd.api.types.union_categoricals(partes, ignore_order=True)
+    return df_concat
+
+def sort_by_year(df_clean):
+    """Ordena las filas por Año (orden estable) para que cada año sea un rango contiguo."""
+    codes = df_clean[YEAR_COLUMN].cat.codes.to_numpy()
+    if len(codes) < 2 or (np.diff(codes) >= 0).all():
+        return df_clean
+    return df_clean.take(np.argsort(codes, kind='stable')).reset_index(drop=True)
+
+def clean_by_partition(raw_sheets):
+    """Limpia las hojas periodo por periodo, reutilizando las particiones que no cambiaron.
+
+    `raw_sheets` es una lista de pares (hoja cruda, año de la hoja). Cada Periodo crudo
+    se identifica por el hash de sus filas: sólo los meses nuevos o modificados pasan
+    por `clean_data`; el resto se lee de su partición Parquet.
+    """
+    partitions = []
+    partition_paths = set()
+    for df_excel, anio in raw_sheets:
+        if 'Periodo' in df_excel.columns:
+            raw_partitions = [group for _, group in df_excel.groupby('Periodo', sort=False, dropna=False, observed=True)]
+        else:
+            raw_partitions = [df_excel]
+
+        for raw_partition in raw_partitions:
+            partition_path = get_partition_path(raw_partition, anio)
+            partition_paths.add(partition_path)
+            df_partition = read_snapshot(partition_path)
+            if df_partition is None:
+                df_partition = normalize_for_snapshot(clean_data(raw_partition.reset_index(drop=True), anio))
+                write_snapshot(df_partition, partition_path)
+            partitions.append(df_partition)
+
+    remove_stale_snapshots(PARTITION_DIR, PARTITION_PREFIX, partition_paths)
+    return normalize_for_snapshot(sort_by_year(concat_partitions(partitions)))
+
+# --- Carga del Dataset ---
+class DataLoadError(Exception):
+    """No se pudo descargar o leer el Excel de origen."""
+
+def is_numeric_cell(valor):
+    """True si la celda es un número (los booleanos no cuentan como números)."""
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool)
+
+def compact_chunk(filas, nombres):
+    """Pasa un bloque de filas a columnas compactas con los mismos tipos que daría
+    `pd.read_excel`: LEGAJO y las columnas sólo numéricas como int64/float64, fechas
+    datetime64 y el resto Categorical (con categorías object, para poder unir bloques)."""
+    columnas = {}
+    for nombre, valores in zip(nombres, zip(*filas)):
+        serie = pd.Series(valores, dtype=object)
+        if nombre == 'LEGAJO':
+            columnas[nombre] = pd.to_numeric(serie, errors='coerce')
+        elif nombre in SOURCE_DATE_COLUMNS:
+            columnas[nombre] = pd.to_datetime(serie, errors='coerce')
+        elif all(is_numeric_cell(valor) for valor in valores if valor is not None):
+            # Como en read_excel: un 'Nivel' entero con celdas vacías queda float64 ('1.0')
+            # y una columna sin valores, float64 con NaN.
+            columnas[nombre] = pd.to_numeric(serie)
+        else:
+            codes, categorias = pd.factorize(serie)
+            columnas[nombre] = pd.Categorical.from_codes(codes, categories=pd.Index(categorias, dtype=object))
+    return pd.DataFrame(columnas)
+
+def concat_chunks(chunks):
+    """Une los bloques columna por columna, sin pasar las categóricas por object.
+
+    Si una columna es numérica en unos bloques y de texto en otros, queda object
+    con los valores originales, como en `pd.read_excel`.
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+    columnas = {}
+    for col in chunks[0].columns:
+        partes = [chunk[col] for chunk in chunks]
+        # Los bloques sin ningún valor en la columna no deciden su tipo.
+        con_valores = [parte for parte in partes if parte.notna().any()] or partes
+        categoricas = [isinstance(parte.dtype, pd.CategoricalDtype) for parte in con_valores]
+        if all(categoricas):
+            vacia = pd.CategoricalDtype(pd.Index([], dtype=object))
+            partes = [parte if isinstance(parte.dtype, pd.CategoricalDtype) else parte.astype(vacia) for parte in partes]
+            columnas[col] = pd.api.types.union_categoricals(partes)
+        elif not any(categoricas):
+            columnas[col] = pd.concat(partes, ignore_index=True)
+        else:
+            columnas[col] = pd.concat([parte.astype(object) for parte in partes], ignore_index=True)
+    return pd.DataFrame(columnas)
+
+def read_sheet_columns(contenido, hoja, columns=SOURCE_COLUMNS, chunk_rows=READ_CHUNK_ROWS):
+    """Lee una hoja en modo streaming (openpyxl read-only), sólo con las columnas indicadas.
+
+    Las filas se recorren en bloques de `chunk_rows`; cada bloque se convierte a tipos
+    compactos antes de leer el siguiente, de modo que el pico de memoria queda cerca
+    del tamaño del DataFrame final. Las filas vacías se descartan.
+    """
+    libro = openpyxl.load_workbook(io.BytesIO(contenido), read_only=True, data_only=True)
+    try:
+        filas = libro[hoja].iter_rows(values_only=True)
+        encabezado = next(filas, None) or ()
+        posiciones = {}
+        for posicion, nombre in enumerate(encabezado):
+            if nombre in columns and nombre not in posiciones:
+                posiciones[nombre] = posicion
+        nombres = list(posiciones)
+        if not nombres:
+            return pd.DataFrame()
+
+        chunks, bloque = [], []
+        for fila in filas:
+            valores = [fila[posicion] if posicion < len(fila) else None for posicion in posiciones.values()]
+            if any(valor is not None for valor in valores):
+                bloque.append(valores)
+            if len(bloque) == chunk_rows:
+                chunks.append(compact_chunk(bloque, nombres))
+                bloque = []
+        if bloque or not chunks:
+            chunks.append(compact_chunk(bloque, nombres) if bloque else pd.DataFrame(columns=nombres))
+        return concat_chunks(chunks)
+    finally:
+        libro.close()
+
+def list_year_sheets(contenido):
+    """Hojas anuales de un libro, como pares (nombre de hoja, año)."""
+    with pd.ExcelFile(io.BytesIO(contenido), engine='openpyxl') as libro:
+        nombres = libro.sheet_names
+    hojas = []
+    for nombre in nombres:
+        coincidencia = YEAR_SHEET_PATTERN.match(nombre)
+        if coincidencia:
+            anio = int(coincidencia.group(1))
+            hojas.append((nombre, anio + 2000 if anio < 100 else anio))
+    return hojas
+
+def fetch_workbooks(urls):
+    """Descarga en paralelo el contenido de los libros, en el orden de `urls`."""
+    with ThreadPoolExecutor(max_workers=max(1, min(LOAD_WORKERS, len(urls)))) as executor:
+        descargas = [executor.submit(fetch_workbook_bytes, url) for url in urls]
+        contenidos = []
+        for url, descarga in zip(urls, descargas):
+            try:
+                contenidos.append(descarga.result())
+            except Exception as e:
+                raise DataLoadError(f"No se pudo descargar el archivo desde la URL {url}. Mensaje: {e}") from e
+    return contenidos
+
+def load_clean_dataset(urls, contenidos=None):
+    """Carga y limpia los datos desde una o varias URLs de archivos Excel en GitHub.
+
+    Los libros se descargan y sus hojas anuales ('Dotacion_AA') se leen en paralelo
+    con un pool de hilos. El DataFrame limpio se guarda como snapshot Parquet
+    identificado por el hash del contenido de los Excel, de modo que el parseo y la
+    limpieza sólo se repiten cuando algún archivo de origen cambia. Aun entonces,
+    sólo se limpian los periodos nuevos o modificados (ver `clean_by_partition`).
+    Las filas quedan ordenadas por Año y la versión del dataset queda en
+    `df.attrs['version']`. `contenidos` permite pasar los libros ya descargados
+    con `fetch_workbooks`.
+    """
+    if isinstance(urls, str):
+        urls = [urls]
+    if contenidos is None:
+        contenidos = fetch_workbooks(urls)
+
+    snapshot_path = get_snapshot_path(contenidos)
+    df_snapshot = read_snapshot(snapshot_path)
+    if df_snapshot is not None:
+        df_snapshot.attrs['version'] = snapshot_path.stem
+        return df_snapshot
+
+    tareas = []
+    for url, contenido in zip(urls, contenidos):
+        try:
+            hojas = list_year_sheets(contenido)
+        except Exception as e:
+            raise DataLoadError(f"No se pudo abrir el archivo descargado desde la URL {url}. Mensaje: {e}") from e
+        if not hojas:
+            raise DataLoadError(f"El archivo de la URL {url} no tiene ninguna hoja 'Dotacion_AA'.")
+        tareas.extend((url, contenido, hoja, anio) for hoja, anio in hojas)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(LOAD_WORKERS, len(tareas)))) as executor:
+        lecturas = [
+            executor.submit(read_sheet_columns, contenido, hoja)
+            for _, contenido, hoja, _ in tareas
+        ]
+        raw_sheets = []
+        for (url, _, hoja, anio), lectura in zip(tareas, lecturas):
+            try:
+                df_excel = lectura.result()
+            except Exception as e:
+                raise DataLoadError(f"No se pudo leer la hoja '{hoja}' desde la URL {url}. Mensaje: {e}") from e
+            if not df_excel.empty:
+                raw_sheets.append((df_excel, anio))
+
+    if not raw_sheets:
+        return pd.DataFrame()
+
+    df_clean = clean_by_partition(raw_sheets)
+    write_snapshot(df_clean, snapshot_path)
+    remove_stale_snapshots(SNAPSHOT_DIR, SNAPSHOT_PREFIX, {snapshot_path})
+    df_clean.attrs['version'] = snapshot_path.stem
+    return df_clean
+
+def freeze_frame(dataframe):
+    """Deja de sólo lectura los arreglos NumPy que respaldan las columnas del DataFrame.
+
+    Pensado para el DataFrame que comparten todas las sesiones: una escritura en el
+    lugar falla en vez de modificar los datos de los demás. En las categóricas se
+    marcan los códigos (el arreglo interno, no la copia que devuelve `.cat.codes`)
+    y los valores de las categorías. Las columnas respaldadas por Arrow ya son
+    inmutables. Agregar o quitar columnas no se puede impedir y sigue permitido:
+    el dashboard no lo hace sobre el DataFrame compartido.
+    """
+    for col in dataframe.columns:
+        serie = dataframe[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            arreglos = [serie.array._codes, serie.array.categories._values]
+        elif isinstance(serie.dtype, np.dtype):
+            arreglos = [serie.to_numpy(copy=False)]
+        else:
+            continue
+        for values in arreglos:
+            if not isinstance(values, np.ndarray):
+                continue
+            # Se marca el arreglo base: las vistas que se creen después heredan la marca.
+            while isinstance(values.base, np.ndarray):
+                values = values.base
+            values.flags.writeable = False
+    return dataframe
+
+# --- Dimensiones de filtros y gráficos ---
+DIMENSION_COLUMNS = ['Gerencia', 'Relación', 'Sexo', 'Función', 'Distrito', 'Ministerio', 'Rango Antiguedad', 'Rango Edad', 'Año', 'Periodo', 'Nivel']
+# Columna por la que se ordenan las filas; su filtro recorta rangos enteros antes de filtrar filas.
+YEAR_COLUMN = 'Año'
+ORDEN_RANGO_ANTIGUEDAD = ['de 0 a 5 años', 'de 5 a 10 años', 'de 11 a 15 años', 'de 16 a 20 años', 'de 21 a 25 años', 'de 26 a 30 años', 'de 31 a 35 años', 'más de 35 años', 'no disponible']
+ORDEN_RANGO_EDAD = ['de 0 a 19 años', 'de 19 a 25 años', 'de 26 a 30 años', 'de 31 a 35 años', 'de 36 a 40 años', 'de 41 a 45 años', 'de 46 a 50 años', 'de 51 a 55 años', 'de 56 a 60 años', 'de 61 a 65 años', 'más de 65 años', 'no disponible']
+MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+ORDEN_CANONICO = {
+    'Rango Antiguedad': ORDEN_RANGO_ANTIGUEDAD,
+    'Rango Edad': ORDEN_RANGO_EDAD,
+}
+
+# --- Motor de rangos de edad y antigüedad ---
+# Límites inferiores (en años) de cada rango; el último rango queda abierto.
+BINS_ANTIGUEDAD = [0, 5, 10, 15, 20, 25, 30, 35]
+BINS_EDAD = [0, 19, 25, 30, 35, 40, 45, 50, 55, 60, 65]
+DIAS_POR_ANIO = 365.25
+
+def period_reference_dates(periodos):
+    """Fecha de referencia de cada fila: el último día del mes de su Periodo.
+
+    Las filas sin un Periodo con fecha válida usan la fecha de hoy.
+    """
+    meses = periodos.to_numpy(dtype='datetime64[ns]').astype('datetime64[M]')
+    fin_de_mes = (meses + 1).astype('datetime64[D]') - 1
+    hoy = np.datetime64(datetime.now().date(), 'D')
+    return np.where(np.isnat(fin_de_mes), hoy, fin_de_mes)
+
+def days_between(fechas, fechas_referencia):
+    """Días enteros entre cada fecha y su fecha de referencia (-1 si falta alguna de las dos)."""
+    dias_fecha = pd.to_datetime(fechas, errors='coerce').to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    invalidas = np.isnat(dias_fecha) | np.isnat(fechas_referencia)
+    dias = (fechas_referencia - dias_fecha).astype(np.int64)
+    dias[invalidas] = -1
+    return dias
+
+def bin_days(dias, bins_years, labels):
+    """Asigna cada cantidad de días a su rango con `searchsorted` y devuelve un Categorical.
+
+    Los límites en años se pasan a días enteros una sola vez; los valores negativos o
+    faltantes quedan como 'no disponible' (última categoría).
+    """
+    limites_dias = np.ceil(np.asarray(bins_years, dtype=float) * DIAS_POR_ANIO).astype(np.int64)
+    codes = np.searchsorted(limites_dias, dias, side='right') - 1
+    codes[dias < 0] = len(labels)
+    return pd.Categorical.from_codes(codes, categories=list(labels) + ['no disponible'], ordered=True)
+
+def period_sort_key(periodo):
+    """Clave cronológica de una etiqueta de Periodo ('Enero 2025'); lo no reconocido va al final."""
+    mes, _, anio = str(periodo).rpartition(' ')
+    if not mes:
+        mes, anio = anio, ''
+    indice_mes = MESES.index(mes) if mes in MESES else len(MESES)
+    return (int(anio) if anio.isdigit() else 9999, indice_mes, str(periodo))
+
+def sort_dimension_values(values, column_name):
+    """Ordena los valores de una dimensión según su orden canónico (o alfabético si no tiene)."""
+    if column_name == 'Periodo':
+        return sorted(values, key=period_sort_key)
+    order = ORDEN_CANONICO.get(column_name)
+    if order is None:
+        return sorted(values)
+    values_set = set(values)
+    present_values = [val for val in order if val in values_set]
+    other_values = [val for val in values if val not in order]
+    return present_values + sorted(other_values)
+
+def to_dimension_categorical(serie, column_name):
+    """Normaliza una columna de dimensión y la convierte a Categorical ordenado.
+
+    La normalización (espacios, valores vacíos, mayúsculas) se hace sobre las categorías
+    distintas y no fila por fila; las filas sólo se recodifican con enteros.
+    """
+    cat = serie.astype('category')
+    valores = pd.Series(cat.cat.categories.astype(str)).str.strip()
+    valores = valores.replace(['None', 'nan', 'NaT', ''], 'no disponible')
+    if column_name in ['Rango Antiguedad', 'Rango Edad']:
+        valores = valores.str.lower()
+    elif column_name == 'Periodo':
+        valores = valores.str.capitalize()
+    # El código -1 (valor faltante) toma el último elemento: 'no disponible'.
+    faltante = 'No disponible' if column_name == 'Periodo' else 'no disponible'
+    valores = np.append(valores.to_numpy(dtype=object), faltante)
+
+    unique_values, inverse = np.unique(valores.astype(str), return_inverse=True)
+    categorias = sort_dimension_values(unique_values.tolist(), column_name)
+    posicion = pd.Index(categorias).get_indexer(unique_values)
+    codes = posicion[inverse][cat.cat.codes.to_numpy()]
+    categorical = pd.Categorical.from_codes(codes, categories=categorias, ordered=True)
+    return pd.Series(categorical, index=serie.index, name=serie.name).cat.remove_unused_categories()
+
+def clean_data(df_excel, anio=None):
+    """Aplica la limpieza y el cálculo de rangos sobre una hoja anual ya leída.
+
+    `anio` es el año de la hoja; se usa cuando el Periodo trae sólo el nombre del mes.
+    """
+    if 'LEGAJO' in df_excel.columns:
+        df_excel['LEGAJO'] = pd.to_numeric(df_excel['LEGAJO'], errors='coerce')
+
+    excel_col_fecha_ingreso_raw = 'Fecha ing.'
+    excel_col_fecha_nacimiento_raw = 'Fecha Nac.'
+    excel_col_rango_antiguedad_raw = 'Rango (Antigüedad)'
+    excel_col_rango_edad_raw = 'Rango (Edad)'
+
+    # Edad y antigüedad se calculan al cierre del mes de cada Periodo
+    fechas_periodo = pd.Series(pd.NaT, index=df_excel.index, dtype='datetime64[ns]')
+    if 'Periodo' in df_excel.columns:
+        try:
+            fechas_periodo = pd.to_datetime(df_excel['Periodo'], errors='coerce')
+        except (TypeError, ValueError):
+            pass
+        if anio is not None and fechas_periodo.isna().all():
+            # Periodo con el nombre del mes ('Enero'): la fecha se arma con el año de la hoja.
+            numero_mes = df_excel['Periodo'].astype(str).str.strip().str.capitalize().map({mes: i for i, mes in enumerate(MESES, start=1)})
+            fechas_periodo = pd.to_datetime(pd.DataFrame({'year': anio, 'month': numero_mes, 'day': 1}), errors='coerce')
+    fechas_referencia = period_reference_dates(fechas_periodo)
+
+    # --- RANGO ANTIGÜEDAD ---
+    if excel_col_rango_antiguedad_raw in df_excel.columns and df_excel[excel_col_rango_antiguedad_raw].notna().sum() > 0:
+        df_excel['Rango Antiguedad'] = df_excel[excel_col_rango_antiguedad_raw]
+    elif excel_col_fecha_ingreso_raw in df_excel.columns:
+        dias_antiguedad = days_between(df_excel[excel_col_fecha_ingreso_raw], fechas_referencia)
+        df_excel['Antiguedad (años)'] = np.where(dias_antiguedad >= 0, dias_antiguedad / DIAS_POR_ANIO, np.nan)
+        df_excel['Rango Antiguedad'] = bin_days(dias_antiguedad, BINS_ANTIGUEDAD, ORDEN_RANGO_ANTIGUEDAD[:-1])
+    else:
+        df_excel['Rango Antiguedad'] = 'no disponible'
+
+    # --- RANGO EDAD ---
+    if excel_col_rango_edad_raw in df_excel.columns and df_excel[excel_col_rango_edad_raw].notna().sum() > 0:
+        df_excel['Rango Edad'] = df_excel[excel_col_rango_edad_raw]
+    elif excel_col_fecha_nacimiento_raw in df_excel.columns:
+        dias_edad = days_between(df_excel[excel_col_fecha_nacimiento_raw], fechas_referencia)
+        df_excel['Edad (años)'] = np.where(dias_edad >= 0, dias_edad / DIAS_POR_ANIO, np.nan)
+        df_excel['Rango Edad'] = bin_days(dias_edad, BINS_EDAD, ORDEN_RANGO_EDAD[:-1])
+    else:
+        df_excel['Rango Edad'] = 'no disponible'
+
+    # --- PERIODO Y AÑO ---
+    # El Periodo es una clave año-mes ('Enero 2025'), para que varios años convivan.
+    if fechas_periodo.notna().any():
+        meses_periodo = fechas_periodo.dt.to_period('M')
+        etiquetas = {mes: f"{MESES[mes.month - 1]} {mes.year}" for mes in meses_periodo.dropna().unique()}
+        df_excel['Periodo'] = meses_periodo.map(etiquetas)
+        df_excel[YEAR_COLUMN] = fechas_periodo.dt.year.astype('Int64').astype('string')
+        if anio is not None:
+            df_excel[YEAR_COLUMN] = df_excel[YEAR_COLUMN].fillna(str(anio))
+    elif anio is not None:
+        df_excel[YEAR_COLUMN] = str(anio)
+
+    # --- LIMPIEZA FINAL: dimensiones como Categorical con su orden canónico ---
+    for col in DIMENSION_COLUMNS:
+        if col not in df_excel.columns:
+            df_excel[col] = 'no disponible'
+        df_excel[col] = to_dimension_categorical(df_excel[col], col)
+
+    return df_excel
+
+def get_sorted_unique_options(dataframe, column_name):
+    """Obtiene opciones únicas y ordenadas para los filtros."""
+    if column_name in dataframe.columns:
+        serie = dataframe[column_name]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # El orden ya viene dado por las categorías del tipo de dato.
+            return serie.cat.categories.tolist()
+        return sort_dimension_values(serie.dropna().unique().tolist(), column_name)
+    return ['no disponible']
+
+# --- Catálogo de Dimensiones ---
+class DimensionCatalog:
+    """Valores distintos de cada dimensión, en su orden canónico.
+
+    Se arma una sola vez por versión del dataset con np.bincount sobre los códigos
+    categóricos (sólo quedan los valores con alguna fila); las opciones de los
+    filtros y sus posiciones se consultan luego en listas y diccionarios. `nested` indica pares (padre, hijo), como
+    (Año, Periodo), para los que se guardan los valores del hijo de cada padre.
+    """
+
+    def __init__(self, dataframe, columns, nested=()):
+        self.n_rows = len(dataframe)
+        self.values = {}
+        self.positions = {}
+        codes = {}
+        for col in columns:
+            if col not in dataframe.columns:
+                continue
+            serie = dataframe[col]
+            if not isinstance(serie.dtype, pd.CategoricalDtype):
+                orden = sort_dimension_values(serie.dropna().unique().tolist(), col)
+                serie = pd.Series(pd.Categorical(serie, categories=orden, ordered=True))
+            categorias, codigos = serie.cat.categories, serie.cat.codes.to_numpy()
+            conteos = np.bincount(codigos[codigos >= 0], minlength=len(categorias))
+            self.values[col] = [value for value, n in zip(categorias.tolist(), conteos) if n > 0]
+            self.positions[col] = {value: i for i, value in enumerate(self.values[col])}
+            codes[col] = (categorias, codigos)
+
+        self.children = {}
+        for parent, child in nested:
+            if parent not in codes or child not in codes:
+                continue
+            (parent_categories, parent_codes), (child_categories, child_codes) = codes[parent], codes[child]
+            validos = (parent_codes >= 0) & (child_codes >= 0)
+            pares = np.unique(parent_codes[validos].astype(np.int64) * len(child_categories) + child_codes[validos])
+            hijos = {}
+            for parent_code, child_code in zip(pares // len(child_categories), pares % len(child_categories)):
+                hijos.setdefault(parent_categories[parent_code], set()).add(child_categories[child_code])
+            self.children[(parent, child)] = hijos
+
+    def options(self, column):
+        """Opciones ordenadas de un filtro; ['no disponible'] si la columna no existe."""
+        return self.values.get(column, ['no disponible'])
+
+    def options_within(self, column, parent, parent_values):
+        """Opciones de `column` presentes en los valores elegidos de `parent` (todas si no hay elegidos)."""
+        hijos = self.children.get((parent, column))
+        if not parent_values or hijos is None:
+            return self.options(column)
+        permitidos = set().union(*(hijos.get(value, ()) for value in parent_values))
+        return [value for value in self.options(column) if value in permitidos]
+
+    def sort(self, column, values):
+        """Ordena valores de la columna según el orden del catálogo."""
+        positions = self.positions.get(column, {})
+        return sorted(values, key=lambda value: positions.get(value, len(positions)))
+
+# --- Motor de Filtros ---
+class BitmapFilterIndex:
+    """Índice de filtros con un bitmap precalculado por cada par (columna, valor).
+
+    Los bitmaps se guardan con los bits empaquetados (np.packbits). Una selección se
+    resuelve con OR dentro de cada columna y AND entre columnas; las columnas sin
+    selección o con todos sus valores seleccionados no se evalúan.
+
+    Si las filas están ordenadas por `range_column` (el Año), cada valor de esa
+    columna ocupa un rango contiguo de filas: su selección recorta primero el rango
+    de filas y el resto de los bitmaps sólo se evalúa dentro de ese rango.
+    """
+
+    def __init__(self, dataframe, columns, range_column=None):
+        self.n_rows = len(dataframe)
+        self.bitmaps = {}
+        self.range_column = None
+        self.row_ranges = {}
+        for col in columns:
+            if col not in dataframe.columns:
+                continue
+            serie = dataframe[col]
+            if not isinstance(serie.dtype, pd.CategoricalDtype):
+                serie = serie.astype('category')
+            codes = serie.cat.codes.to_numpy()
+            categories = serie.cat.categories.tolist()
+            self.bitmaps[col] = {
+                value: np.packbits(codes == code)
+                for code, value in enumerate(categories)
+            }
+            if col == range_column and (np.diff(codes) >= 0).all():
+                starts = np.searchsorted(codes, np.arange(len(categories)), side='left')
+                stops = np.searchsorted(codes, np.arange(len(categories)), side='right')
+                self.range_column = col
+                self.row_ranges = {
+                    value: (int(start), int(stop))
+                    for value, start, stop in zip(categories, starts, stops)
+                }
+
+    def column_bits(self, col, selected, byte_slice=None):
+        """Bitmap empaquetado (np.packbits) de las filas de `col` con alguno de los valores `selected`.
+
+        Devuelve None si la selección incluye todos los valores, es decir, si no filtra.
+        `byte_slice` recorta el bitmap a un rango de bytes (8 filas por byte); sin él se
+        cubren todas las filas. Los bits de relleno del último byte no están definidos.
+        """
+        bitmaps = self.bitmaps[col]
+        if byte_slice is None:
+            byte_slice = slice(0, (self.n_rows + 7) // 8)
+        selected = [value for value in dict.fromkeys(selected) if value in bitmaps]
+        if len(selected) == len(bitmaps):
+            return None
+        # Si se seleccionó la mayoría de los valores, es más barato negar los no seleccionados.
+        if 2 * len(selected) > len(bitmaps):
+            selected_set = set(selected)
+            return ~self._union([value for value in bitmaps if value not in selected_set], bitmaps, byte_slice)
+        return self._union(selected, bitmaps, byte_slice)
+
+    def _union(self, values, bitmaps, byte_slice):
+        result = np.zeros(byte_slice.stop - byte_slice.start, dtype=np.uint8)
+        for value in values:
+            np.bitwise_or(result, bitmaps[value][byte_slice], out=result)
+        return result
+
+    def _row_range(self, selections):
+        """Rango de filas que abarca la selección de `range_column` y si ese rango ya la resuelve."""
+        selected = selections.get(self.range_column) if self.range_column else None
+        if not selected:
+            return 0, self.n_rows, False
+        ranges = sorted(self.row_ranges[value] for value in set(selected) if value in self.row_ranges)
+        ranges = [(start, stop) for start, stop in ranges if stop > start]
+        if not ranges:
+            return 0, 0, True
+        start, stop = ranges[0][0], ranges[-1][1]
+        # Si los rangos elegidos son contiguos, no hace falta evaluar el bitmap de la columna.
+        contiguous = sum(b - a for a, b in ranges) == stop - start
+        return start, stop, contiguous
+
+    def select(self, selections):
+        """Filas que cumplen las selecciones, como (inicio, fin, máscara dentro del rango).
+
+        La máscara es None si el rango ya resuelve el filtro. El resultado ocupa poco y
+        no referencia al DataFrame, así que se puede guardar en caché y aplicar con `take`.
+        """
+        start, stop, range_resolved = self._row_range(selections)
+        byte_slice = slice(start // 8, (stop + 7) // 8)
+        result = None
+        for col, selected in selections.items():
+            if col not in self.bitmaps or not selected or (range_resolved and col == self.range_column):
+                continue
+            column_bits = self.column_bits(col, selected, byte_slice)
+            if column_bits is None:
+                continue
+            if result is None:
+                result = column_bits
+            else:
+                result = np.bitwise_and(result, column_bits)
+        if result is None:
+            return start, stop, None
+        offset = start - byte_slice.start * 8
+        return start, stop, np.unpackbits(result)[offset:offset + stop - start].view(bool)
+
+    def apply(self, dataframe, selections):
+        """Devuelve las filas de `dataframe` (el mismo con el que se construyó) que cumplen las selecciones.
+
+        `selections` es un diccionario columna -> valores seleccionados; una lista vacía
+        equivale a no filtrar por esa columna.
+        """
+        return self.take(dataframe, self.select(selections))
+
+    def take(self, dataframe, selection):
+        """Aplica a `dataframe` una selección de filas obtenida con `select`."""
+        start, stop, range_mask = selection
+        if (start, stop) != (0, self.n_rows):
+            dataframe = dataframe.iloc[start:stop]
+        if range_mask is None:
+            return dataframe
+        return dataframe[range_mask]
+
+# --- Cubo de Conteos ---
+class HeadcountCube:
+    """Cubo disperso con la cantidad de empleados por cada combinación observada de dimensiones.
+
+    Los filtros y agrupaciones de las pestañas se resuelven sumando la columna
+    'Cantidad' del cubo en lugar de recorrer las filas de empleados. Con
+    `range_column` las celdas quedan ordenadas por esa columna y su filtro recorta
+    rangos de celdas, igual que en `BitmapFilterIndex`.
+    """
+
+    def __init__(self, dataframe, columns, range_column=None):
+        self.columns = [col for col in columns if col in dataframe.columns]
+        if range_column in self.columns:
+            self.columns.remove(range_column)
+            self.columns.insert(0, range_column)
+        self.counts = dataframe.groupby(self.columns, observed=True).size().reset_index(name='Cantidad')
+        self.filter_index = BitmapFilterIndex(self.counts, self.columns, range_column)
+
+    def filter(self, selections):
+        """Celdas del cubo que cumplen las selecciones de la barra lateral."""
+        return self.filter_index.apply(self.counts, selections)
+
+    def select(self, selections):
+        """Selección de celdas, para guardar en caché y aplicar luego con `take`."""
+        return self.filter_index.select(selections)
+
+    def take(self, selection):
+        """Celdas del cubo de una selección obtenida con `select`."""
+        return self.filter_index.take(self.counts, selection)
+
+def cube_counts(cube_slice, by):
+    """Suma los conteos de un recorte del cubo agrupando por las columnas indicadas."""
+    return cube_slice.groupby(by, observed=True)['Cantidad'].sum().reset_index()
+
+# --- Conteos Facetados ---
+def _and_bits(a, b):
+    """AND de dos bitmaps empaquetados, donde None significa "sin filtro"."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return np.bitwise_and(a, b)
+
+def _cumulative_and(bits):
+    """AND acumulado de los bitmaps anteriores a cada posición (excluyendo la propia)."""
+    result, acumulado = [], None
+    for column_bits in bits:
+        result.append(acumulado)
+        acumulado = _and_bits(acumulado, column_bits)
+    return result
+
+class FacetCounter:
+    """Cantidad de empleados por valor de cada filtro, bajo las selecciones de los demás filtros.
+
+    Trabaja sobre las celdas del cubo y guarda el bitmap empaquetado de la selección
+    de cada columna. En cada `update` sólo se recalculan los bitmaps de las columnas
+    cuya selección cambió y los conteos de las columnas afectadas: si cambió una sola
+    columna, sus propios conteos no se tocan. Los bitmaps de "todas las demás
+    columnas" salen de ANDs acumulados de izquierda a derecha y de derecha a izquierda.
+
+    `linked` indica, para una columna, otras columnas cuya selección se reinicia al
+    cambiarla (el Año reinicia los Periodos): sus conteos no las tienen en cuenta.
+    """
+
+    def __init__(self, cube, linked=None):
+        self.cube = cube
+        self.columns = list(cube.columns)
+        self.linked = {col: set(deps) for col, deps in (linked or {}).items()}
+        self.weights = cube.counts['Cantidad'].to_numpy()
+        self.codes = {col: cube.counts[col].cat.codes.to_numpy() for col in self.columns}
+        self.categories = {col: cube.counts[col].cat.categories.tolist() for col in self.columns}
+        self._signatures = {}
+        self._bits = {}
+        self.facets = {}
+
+    def _others_bits(self):
+        """Para cada columna, el AND de los bitmaps de todas las demás (None si ninguna filtra)."""
+        bits = [self._bits[col] for col in self.columns]
+        prefix = _cumulative_and(bits)
+        suffix = _cumulative_and(bits[::-1])[::-1]
+        others = {col: _and_bits(antes, despues) for col, antes, despues in zip(self.columns, prefix, suffix)}
+        for col, deps in self.linked.items():
+            if col in others:
+                excluidas = deps | {col}
+                others[col] = _cumulative_and([self._bits[c] for c in self.columns if c not in excluidas] + [None])[-1]
+        return others
+
+    def update(self, selections):
+        """Devuelve {columna: {valor: cantidad}} para las selecciones actuales."""
+        changed = []
+        for col in self.columns:
+            selected = selections.get(col)
+            signature = frozenset(selected) if selected else None
+            if col in self._signatures and self._signatures[col] == signature:
+                continue
+            self._signatures[col] = signature
+            self._bits[col] = None if signature is None else self.cube.filter_index.column_bits(col, selected)
+            changed.append(col)
+        if not changed:
+            return self.facets
+
+        affected = [
+            col for col in self.columns
+            if col not in self.facets or not set(changed) <= self.linked.get(col, set()) | {col}
+        ]
+        others = self._others_bits()
+        n_cells = len(self.weights)
+        for col in affected:
+            codes, weights = self.codes[col], self.weights
+            if others[col] is not None:
+                mask = np.unpackbits(others[col])[:n_cells].view(bool)
+                codes, weights = codes[mask], weights[mask]
+            conteos = np.bincount(codes, weights=weights, minlength=len(self.categories[col]))
+            self.facets[col] = {value: int(n) for value, n in zip(self.categories[col], conteos)}
+        return self.facets
+
+# --- Versiones del Dataset ---
+class DatasetVersion:
+    """Dataset limpio y sus estructuras derivadas (catálogo, índice de filtros y cubo).
+
+    Se arma completo antes de publicarse y no se modifica después: el DataFrame
+    queda de sólo lectura (ver `freeze_frame`).
+    """
+
+    def __init__(self, dataframe):
+        self.frame = freeze_frame(dataframe)
+        self.version = dataframe.attrs.get('version')
+        self.catalog = DimensionCatalog(dataframe, DIMENSION_COLUMNS, nested=[(YEAR_COLUMN, 'Periodo')])
+        self.filter_index = BitmapFilterIndex(dataframe, DIMENSION_COLUMNS, range_column=YEAR_COLUMN)
+        self.cube = HeadcountCube(dataframe, DIMENSION_COLUMNS, range_column=YEAR_COLUMN)
+
+class DatasetRefresher:
+    """Carga el dataset en un hilo de fondo y lo vuelve a cargar cada `interval` segundos.
+
+    Cada versión nueva se arma entera fuera de la vista de los lectores y se publica
+    en `current` con una sola asignación: quien lea `current` obtiene la versión
+    anterior o la nueva, nunca una a medio armar. Si el contenido descargado no
+    cambió no se lee ni se rearma nada. Con `result_cache`, después de publicar se
+    calculan los resultados de la vista inicial (ver `seed_default_results`), para
+    que la primera sesión de cada versión no los pague. Si una carga falla, la versión publicada se conserva y el error
+    queda en `last_error`.
+    """
+
+    def __init__(self, urls, interval=RELOAD_INTERVAL, retry_delay=RELOAD_RETRY_DELAY, result_cache=None):
+        self.urls = [urls] if isinstance(urls, str) else list(urls)
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self.result_cache = result_cache
+        self.current = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='dotacion-recarga', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Detiene las recargas; el hilo termina sin esperar al próximo intervalo."""
+        self._stop.set()
+
+    def reload(self):
+        """Carga el dataset y publica una versión nueva si el contenido cambió."""
+        contenidos = fetch_workbooks(self.urls)
+        # La versión es el nombre del snapshot, que sólo depende de los bytes descargados.
+        if self.current is not None and self.current.version == get_snapshot_path(contenidos).stem:
+            return
+        df = load_clean_dataset(self.urls, contenidos)
+        if df.empty:
+            raise DataLoadError("Las hojas anuales no tienen filas.")
+        self.current = DatasetVersion(df)
+        if self.result_cache is not None:
+            seed_default_results(self.current, self.result_cache)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.reload()
+                self.last_error = None
+            except Exception as e:
+                # El hilo no debe morir: el error se muestra y se reintenta más tarde.
+                self.last_error = e
+            self._stop.wait(self.interval if self.current is not None else min(self.interval, self.retry_delay))
+
+# --- Caché de Resultados ---
+def filter_signature(selections, catalog):
+    """Firma canónica de las selecciones de la barra lateral.
+
+    No depende del orden de las columnas ni de los valores; una columna sin selección
+    o con todos sus valores seleccionados no filtra y no aparece en la firma.
+    """
+    firma = []
+    for col in sorted(selections):
+        seleccion = set(selections[col] or ())
+        if not seleccion or seleccion.issuperset(catalog.options(col)):
+            continue
+        positions = catalog.positions.get(col, {})
+        valores = sorted(seleccion, key=lambda value: (positions.get(value, len(positions)), str(value)))
+        firma.append((col, tuple(valores)))
+    return tuple(firma)
+
+def result_nbytes(value):
+    """Estimación de la memoria que ocupa un resultado (DataFrames, arreglos y tuplas de ellos)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(result_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+class ResultCache:
+    """Caché LRU de resultados compartida por todas las sesiones, acotada por memoria.
+
+    Las claves se combinan con la versión del dataset. Al publicarse una versión
+    nueva, las sesiones que todavía dibujan la anterior siguen encontrando sus
+    resultados; las entradas de la versión vieja dejan de usarse y son las primeras
+    en desalojarse al superar `max_bytes` (se desalojan las usadas hace más tiempo).
+    Los resultados se comparten entre sesiones, así que no deben modificarse en el lugar.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_MB * 2**20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, version, key, compute):
+        """Devuelve el resultado guardado para (versión, clave) o lo calcula con `compute()`."""
+        key = (version, key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Se calcula fuera del lock: dos sesiones pueden calcular a la vez la misma clave.
+        value = compute()
+        size = result_nbytes(value)
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = (value, size)
+                self.nbytes += size
+                while self.nbytes > self.max_bytes:
+                    _, (_, liberado) = self._entries.popitem(last=False)
+                    self.nbytes -= liberado
+        return value
+
+    def stats(self):
+        """Entradas, memoria usada (MB), aciertos y fallos desde el arranque del proceso."""
+        with self._lock:
+            return {'entradas': len(self._entries), 'mb': self.nbytes / 2**20, 'aciertos': self.hits, 'fallos': self.misses}
+
+def default_years(catalog):
+    """Años con los que abre el dashboard: el último año con fecha (o todos si ninguno la tiene)."""
+    anios = catalog.options(YEAR_COLUMN)
+    con_fecha = [anio for anio in anios if anio.isdigit()]
+    return con_fecha[-1:] or anios
+
+def default_selections(catalog):
+    """Selecciones de la vista inicial: los años por defecto, sus periodos y todo lo demás."""
+    selections = {col: catalog.options(col) for col in DIMENSION_COLUMNS}
+    selections[YEAR_COLUMN] = default_years(catalog)
+    selections['Periodo'] = catalog.options_within('Periodo', YEAR_COLUMN, selections[YEAR_COLUMN])
+    return selections
+
+def seed_default_results(dataset, cache):
+    """Calcula en `cache` los resultados de la vista inicial de `dataset`.
+
+    Usa las mismas claves que `cached_result` en app.py (firma de los filtros y
+    nombre del resultado); si cambian allí, hay que cambiarlas también aquí.
+    """
+    selections = default_selections(dataset.catalog)
+    firma = filter_signature(selections, dataset.catalog)
+
+    def guardar(nombre, compute):
+        return cache.get_or_compute(dataset.version, (firma, nombre), compute)
+
+    seleccion_filas, seleccion_celdas = guardar(
+        'filtrado', lambda: (dataset.filter_index.select(selections), dataset.cube.select(selections))
+    )
+    filtered_df = dataset.filter_index.take(dataset.frame, seleccion_filas)
+    filtered_cube = dataset.cube.take(seleccion_celdas)
+    if filtered_df.empty:
+        return
+    periodos = dataset.catalog.sort('Periodo', selections['Periodo'])
+    guardar('kpis', lambda: compute_kpis(filtered_cube, periodos))
+    periodo_counts = guardar('periodo', lambda: cube_counts(filtered_cube, 'Periodo'))
+    guardar('variacion', lambda: build_monthly_variation(periodo_counts))
+    for nombre, columna in [('sexo', 'Sexo'), ('relacion', 'Relación')]:
+        counts = guardar(nombre, lambda: cube_counts(filtered_cube, ['Periodo', columna]))
+        guardar(f'{nombre}_pivot', lambda: build_period_pivot(counts, columna))
+    if len(periodos) > 1:
+        movimientos = guardar('movimientos', lambda: compute_movements(filtered_df))
+        guardar('movimientos_resumen', lambda: summarize_movements(movimientos))
+
+# --- Tablas de las Pestañas ---
+# Categorías que se pueden elegir en la pestaña de desglose.
+CATEGORIAS_DESGLOSE = ['Gerencia', 'Ministerio', 'Función', 'Distrito', 'Nivel']
+
+def build_period_pivot(counts, column):
+    """Tabla Periodo x `column` (p. ej. Sexo o Relación) con la columna Total."""
+    pivot = counts.pivot_table(index='Periodo', columns=column, values='Cantidad', fill_value=0, observed=True)
+    pivot.columns = pivot.columns.astype(str)
+    pivot['Total'] = pivot.sum(axis=1)
+    return pivot.reset_index()
+
+def format_fixed(values, decimals=2, suffix=''):
+    """Formatea números con `decimals` decimales fijos, sin recorrer fila por fila.
+
+    Redondea con aritmética entera y arma el texto con operaciones vectorizadas de
+    pandas; los valores faltantes quedan como cadena vacía.
+    """
+    values = np.asarray(values, dtype=float)
+    validos = np.isfinite(values)
+    escala = 10 ** decimals
+    escalados = np.round(np.where(validos, values, 0) * escala).astype(np.int64)
+    absolutos = np.abs(escalados)
+    texto = pd.Series(np.where(escalados < 0, '-', ''), dtype=object) + pd.Series(absolutos // escala).astype(str)
+    if decimals > 0:
+        texto = texto + '.' + pd.Series(absolutos % escala).astype(str).str.zfill(decimals)
+    texto = (texto + suffix).to_numpy(dtype=object)
+    texto[~validos] = ''
+    return texto
+
+def build_variation(counts, column=None):
+    """Variación mes a mes de la cantidad, total o por cada valor de `column`.
+
+    Arma una matriz Periodo x grupo y calcula en una sola pasada la cantidad del mes
+    anterior, la variación absoluta y la porcentual. Devuelve la tabla para el
+    gráfico (con la columna 'label') y la tabla formateada para mostrar; las filas
+    quedan ordenadas por grupo y, dentro de cada grupo, por Periodo.
+    """
+    if column is None:
+        wide = counts.groupby('Periodo', observed=True)['Cantidad'].sum().to_frame()
+    else:
+        wide = counts.pivot_table(index='Periodo', columns=column, values='Cantidad', aggfunc='sum', fill_value=0, observed=True)
+    actual = wide.to_numpy(dtype=float)
+    anterior = np.vstack([np.full((1, actual.shape[1]), np.nan), actual[:-1]])
+    variacion = actual - anterior
+    with np.errstate(divide='ignore', invalid='ignore'):
+        porcentaje = np.where(anterior > 0, variacion / anterior * 100, np.nan)
+
+    # Orden grupo-mayor: se trasponen las matrices antes de aplanarlas.
+    n_periodos, n_grupos = actual.shape
+    var_counts = pd.DataFrame({'Periodo': wide.index.take(np.tile(np.arange(n_periodos), n_grupos))})
+    if column is not None:
+        var_counts[column] = wide.columns.take(np.repeat(np.arange(n_grupos), n_periodos))
+    var_counts['Cantidad_Actual'] = actual.T.ravel().astype(np.int64)
+    var_counts['Cantidad_Mes_Anterior'] = anterior.T.ravel()
+    var_counts['Variacion_Cantidad'] = variacion.T.ravel()
+    var_counts['Variacion_%'] = porcentaje.T.ravel()
+    if column is not None:
+        # Un grupo sin empleados ni en el mes ni en el anterior no aporta una fila.
+        sin_dotacion = (var_counts['Cantidad_Actual'] == 0) & ~(var_counts['Cantidad_Mes_Anterior'] > 0)
+        var_counts = var_counts[~sin_dotacion].reset_index(drop=True)
+
+    con_porcentaje = var_counts['Variacion_%'].notna().to_numpy()
+    label = format_fixed(var_counts['Variacion_Cantidad'], 0) + ' (' + format_fixed(var_counts['Variacion_%'], 2, '%)')
+    var_counts['label'] = np.where(con_porcentaje, label, '')
+
+    display_var_table = var_counts.drop(columns=['label'])
+    display_var_table['Variacion_%'] = format_fixed(var_counts['Variacion_%'], 2, '%')
+    for col in ['Cantidad_Mes_Anterior', 'Variacion_Cantidad']:
+        display_var_table[col] = format_fixed(var_counts[col], 0)
+    return var_counts, display_var_table
+
+def build_monthly_variation(periodo_counts):
+    """Variación mensual del total: devuelve la tabla para el gráfico y la tabla para mostrar."""
+    return build_variation(periodo_counts)
+
+def build_range_table(cube_periodo, range_column):
+    """Tabla Rango x Relación de un periodo, con Total, % sobre el periodo y fila de totales."""
+    total_empleados = int(cube_periodo['Cantidad'].sum())
+    range_table = cube_periodo.groupby([range_column, 'Relación'], observed=True)['Cantidad'].sum().unstack(fill_value=0)
+    range_table.columns = range_table.columns.astype(str)
+    range_table['Total'] = range_table.sum(axis=1)
+    range_table['% sobre Total Periodo'] = (range_table['Total'] / total_empleados * 100).map('{:.2f}%'.format) if total_empleados > 0 else '0.00%'
+    range_table_display = range_table.reset_index()
+    total_row_values = {col: range_table_display[col].sum() for col in range_table_display.columns if col not in [range_column, '% sobre Total Periodo']}
+    total_row_values[range_column] = 'Total'
+    total_row_values['% sobre Total Periodo'] = '100.00%'
+    total_row_df = pd.DataFrame([total_row_values])
+    return pd.concat([range_table_display, total_row_df], ignore_index=True)
+
+def build_breakdown_table(breakdown_counts, category):
+    """Tabla de desglose por categoría, de mayor a menor, con % y fila de totales."""
+    total_empleados = int(breakdown_counts['Cantidad'].sum())
+    table_data = breakdown_counts.sort_values('Cantidad', ascending=False) # Ordena la tabla
+
+    if total_empleados > 0:
+        table_data['%'] = (table_data['Cantidad'] / total_empleados * 100).map('{:.2f}%'.format)
+    else:
+        table_data['%'] = '0.00%'
+
+    total_row = pd.DataFrame({
+        category: ['Total'],
+        'Cantidad': [table_data['Cantidad'].sum()],
+        '%': ['100.00%']
+    })
+    return pd.concat([table_data, total_row], ignore_index=True)
+
+# Valores que muestra el gráfico de desglose; el resto se agrupa en una barra 'Otros'.
+DESGLOSE_TOP_N = 15
+OTROS_LABEL = 'Otros'
+
+def top_n_counts(breakdown_counts, category, n=DESGLOSE_TOP_N, offset=0):
+    """Los valores de los puestos offset+1 a offset+n por cantidad y el resto agrupado en 'Otros'.
+
+    Los primeros offset+n puestos se eligen con np.argpartition y sólo ellos se
+    ordenan; a igual cantidad desempata el orden de la categoría. Los puestos
+    anteriores a `offset` (los ya vistos al recorrer el desglose) no se incluyen.
+    `attrs['otros']` indica cuántos valores agrupa la fila 'Otros'.
+    """
+    valores = breakdown_counts[category].astype(str).to_numpy()
+    cantidades = breakdown_counts['Cantidad'].to_numpy(dtype=np.int64)
+    k = min(offset + n, len(cantidades))
+    # Clave única: mayor cantidad primero y, a igual cantidad, la primera posición.
+    clave = cantidades * len(cantidades) + np.arange(len(cantidades))[::-1]
+    if 0 < k < len(clave):
+        candidatos = np.argpartition(-clave, k - 1)[:k]
+    else:
+        candidatos = np.arange(len(clave))
+    ordenados = candidatos[np.argsort(-clave[candidatos])][:k]
+    ventana = ordenados[offset:]
+
+    tabla = pd.DataFrame({category: valores[ventana], 'Cantidad': cantidades[ventana]})
+    resto = len(cantidades) - k
+    if resto > 0:
+        otros = pd.DataFrame({category: [OTROS_LABEL], 'Cantidad': [cantidades.sum() - cantidades[ordenados].sum()]})
+        tabla = pd.concat([tabla, otros], ignore_index=True)
+    tabla.attrs['otros'] = resto
+    return tabla
+
+# --- Indicadores del Resumen ---
+# Aperturas de la tarjeta de resumen: cantidad y participación de cada valor por periodo.
+KPI_BREAKDOWNS = ['Relación', 'Sexo', 'Nivel', 'Distrito']
+
+def compute_kpis(cube_slice, periodos, breakdowns=KPI_BREAKDOWNS):
+    """Indicadores de los periodos indicados, en una pasada por apertura sobre el cubo filtrado.
+
+    Cada apertura se resuelve con un solo np.bincount sobre el código combinado
+    (Periodo, valor), sin copiar ni enmascarar filas. Devuelve dos tablas:
+    `totales` (Periodo, Cantidad, Variación) y `kpis` en formato largo (Periodo,
+    Apertura, Valor, Cantidad, Porcentaje, Variación); la variación es contra el
+    periodo anterior de `periodos` y queda vacía en el primero.
+    """
+    periodo_codes = cube_slice['Periodo'].cat.codes.to_numpy()
+    categorias_periodo = cube_slice['Periodo'].cat.categories
+    pesos = cube_slice['Cantidad'].to_numpy()
+    filas = categorias_periodo.get_indexer(periodos)
+    presentes = filas >= 0
+
+    def por_periodo(matriz):
+        # Periodos pedidos, en su orden; los que no están en el cubo quedan en cero.
+        resultado = np.zeros((len(periodos),) + matriz.shape[1:], dtype=np.int64)
+        resultado[presentes] = matriz[filas[presentes]]
+        return resultado
+
+    def variacion(matriz):
+        return np.concatenate([np.full((1,) + matriz.shape[1:], np.nan), np.diff(matriz, axis=0)])
+
+    total = por_periodo(np.bincount(periodo_codes, weights=pesos, minlength=len(categorias_periodo)).astype(np.int64))
+    totales = pd.DataFrame({'Periodo': periodos, 'Cantidad': total, 'Variación': variacion(total)})
+
+    partes = []
+    for col in breakdowns:
+        if col not in cube_slice.columns:
+            continue
+        valores = cube_slice[col].cat.categories
+        combinado = periodo_codes.astype(np.int64) * len(valores) + cube_slice[col].cat.codes.to_numpy()
+        conteos = np.bincount(combinado, weights=pesos, minlength=len(categorias_periodo) * len(valores))
+        matriz = por_periodo(conteos.reshape(len(categorias_periodo), len(valores)).astype(np.int64))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            porcentaje = np.where(total[:, None] > 0, matriz / total[:, None] * 100, 0.0)
+        usados = matriz.any(axis=0)
+        partes.append(pd.DataFrame({
+            'Periodo': np.repeat(periodos, usados.sum()),
+            'Apertura': col,
+            'Valor': np.tile(valores[usados].astype(str), len(periodos)),
+            'Cantidad': matriz[:, usados].ravel(),
+            'Porcentaje': porcentaje[:, usados].ravel(),
+            'Variación': variacion(matriz[:, usados]).ravel(),
+        }))
+    columnas = ['Periodo', 'Apertura', 'Valor', 'Cantidad', 'Porcentaje', 'Variación']
+    kpis = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=columnas)
+    return totales, kpis
+
+def kpi_value(kpis, periodo, apertura, valor):
+    """Fila de un indicador como diccionario (ceros si el valor no tiene empleados)."""
+    fila = kpis[(kpis['Periodo'] == periodo) & (kpis['Apertura'] == apertura) & (kpis['Valor'] == valor)]
+    if fila.empty:
+        return {'Cantidad': 0, 'Porcentaje': 0.0, 'Variación': np.nan}
+    return fila.iloc[0][['Cantidad', 'Porcentaje', 'Variación']].to_dict()
+
+# --- Movimientos de Personal ---
+# Dimensiones cuyo cambio entre periodos consecutivos se informa como movimiento.
+MOVEMENT_COLUMNS = ['Gerencia', 'Función', 'Nivel']
+TIPOS_MOVIMIENTO = ['Alta', 'Baja', 'Cambio']
+
+def period_row_groups(dataframe):
+    """Posiciones de las filas de cada Periodo presente, en orden cronológico."""
+    codes = dataframe['Periodo'].cat.codes.to_numpy()
+    orden = np.argsort(codes, kind='stable')
+    codes_ordenados = codes[orden]
+    presentes = np.unique(codes_ordenados[codes_ordenados >= 0])
+    inicios = np.searchsorted(codes_ordenados, presentes, side='left')
+    finales = np.searchsorted(codes_ordenados, presentes, side='right')
+    categorias = dataframe['Periodo'].cat.categories
+    return [(categorias[code], orden[inicio:final]) for code, inicio, final in zip(presentes, inicios, finales)]
+
+def compute_movements(dataframe, columns=MOVEMENT_COLUMNS):
+    """Altas, bajas y cambios de `columns` entre cada par de periodos consecutivos.
+
+    Cada periodo se reduce a su arreglo ordenado de LEGAJOs enteros. Entre periodos
+    consecutivos, las altas y bajas salen de np.setdiff1d y los que continúan de
+    np.intersect1d, cuyas dimensiones se comparan por código categórico. Devuelve
+    una fila por movimiento; en las bajas las dimensiones son las del último periodo
+    en que figuraba el empleado, y en los cambios las columnas 'Anterior' sólo se
+    completan para lo que cambió.
+    """
+    columns = [col for col in columns if col in dataframe.columns]
+    legajos_filas = pd.to_numeric(dataframe['LEGAJO'], errors='coerce').to_numpy(dtype=float)
+    validas = np.isfinite(legajos_filas)
+    codes = {col: dataframe[col].cat.codes.to_numpy() for col in columns}
+
+    snapshots = []
+    for periodo, filas in period_row_groups(dataframe):
+        filas = filas[validas[filas]]
+        # Un LEGAJO repetido dentro del periodo se toma una sola vez (su primera fila).
+        legajos, primeras = np.unique(legajos_filas[filas].astype(np.int64), return_index=True)
+        snapshots.append((periodo, legajos, filas[primeras]))
+
+    periodos, periodos_anteriores, tipos = [], [], []
+    legajos_mov, filas_mov, filas_previas = [], [], []
+    cambios = {col: [] for col in columns}
+    for (periodo_anterior, legajos_anteriores, filas_anteriores), (periodo, legajos, filas) in zip(snapshots, snapshots[1:]):
+        altas = np.setdiff1d(legajos, legajos_anteriores, assume_unique=True)
+        bajas = np.setdiff1d(legajos_anteriores, legajos, assume_unique=True)
+        _, pos_anterior, pos_actual = np.intersect1d(legajos_anteriores, legajos, assume_unique=True, return_indices=True)
+        fila_anterior, fila_actual = filas_anteriores[pos_anterior], filas[pos_actual]
+        cambio_por_columna = {col: codes[col][fila_anterior] != codes[col][fila_actual] for col in columns}
+        con_cambio = np.zeros(len(pos_actual), dtype=bool)
+        for cambio in cambio_por_columna.values():
+            con_cambio |= cambio
+
+        cantidades = [len(altas), len(bajas), int(con_cambio.sum())]
+        total = sum(cantidades)
+        periodos.append(np.full(total, periodo, dtype=object))
+        periodos_anteriores.append(np.full(total, periodo_anterior, dtype=object))
+        tipos.append(np.repeat(np.arange(len(TIPOS_MOVIMIENTO), dtype=np.int8), cantidades))
+        legajos_mov.append(np.concatenate([altas, bajas, legajos[pos_actual][con_cambio]]))
+        filas_mov.append(np.concatenate([
+            filas[np.searchsorted(legajos, altas)],
+            filas_anteriores[np.searchsorted(legajos_anteriores, bajas)],
+            fila_actual[con_cambio],
+        ]))
+        filas_previas.append(np.concatenate([np.full(len(altas) + len(bajas), -1), fila_anterior[con_cambio]]))
+        for col, cambio in cambio_por_columna.items():
+            cambios[col].append(np.concatenate([np.zeros(len(altas) + len(bajas), dtype=bool), cambio[con_cambio]]))
+
+    def unir(partes, dtype):
+        return np.concatenate(partes).astype(dtype) if partes else np.zeros(0, dtype=dtype)
+
+    categorias_periodo = dataframe['Periodo'].cat.categories
+    fila, fila_previa = unir(filas_mov, np.int64), unir(filas_previas, np.int64)
+    movimientos = pd.DataFrame({
+        'Periodo': pd.Categorical(unir(periodos, object), categories=categorias_periodo, ordered=True),
+        'Periodo Anterior': pd.Categorical(unir(periodos_anteriores, object), categories=categorias_periodo, ordered=True),
+        'LEGAJO': unir(legajos_mov, np.int64),
+        'Movimiento': pd.Categorical.from_codes(unir(tipos, np.int8), categories=TIPOS_MOVIMIENTO),
+    })
+    for col in columns:
+        categorias = dataframe[col].cat.categories
+        movimientos[col] = pd.Categorical.from_codes(codes[col][fila], categories=categorias, ordered=True)
+        # En las altas y bajas fila_previa es -1: esas posiciones quedan descartadas por `cambio`.
+        codigos_previos = np.where(unir(cambios[col], bool), codes[col][fila_previa], -1)
+        movimientos[f'{col} Anterior'] = pd.Categorical.from_codes(codigos_previos, categories=categorias, ordered=True)
+    # Periodos comparados, para que el resumen incluya también los que no tuvieron movimientos.
+    movimientos.attrs['periodos'] = [periodo for periodo, _, _ in snapshots]
+    return movimientos
+
+def summarize_movements(movimientos):
+    """Altas, bajas, cambios y variación neta por Periodo (incluye los periodos sin movimientos)."""
+    resumen = movimientos.groupby('Periodo', observed=True)['Movimiento'].value_counts().unstack(fill_value=0)
+    resumen = resumen.reindex(index=movimientos.attrs.get('periodos', [])[1:], columns=TIPOS_MOVIMIENTO, fill_value=0)
+    resumen.columns = ['Altas', 'Bajas', 'Cambios']
+    resumen['Neto'] = resumen['Altas'] - resumen['Bajas']
+    resumen.index.name = 'Periodo'
+    return resumen.reset_index()
+
+# --- Visor Paginado de Datos Brutos ---
+def search_rows(dataframe, search_text):
+    """Filtra las filas cuyo LEGAJO o alguna dimensión contiene el texto buscado.
+
+    En las columnas categóricas la búsqueda se hace sobre las categorías distintas y
+    luego se traslada a las filas mediante sus códigos.
+    """
+    search_text = search_text.strip().lower()
+    if not search_text or dataframe.empty:
+        return dataframe
+    mask = np.zeros(len(dataframe), dtype=bool)
+    for col in DIMENSION_COLUMNS:
+        if col not in dataframe.columns or not isinstance(dataframe[col].dtype, pd.CategoricalDtype):
+            continue
+        serie = dataframe[col]
+        category_matches = serie.cat.categories.astype(str).str.lower().str.contains(search_text, regex=False)
+        if category_matches.any():
+            # El código -1 (faltante) toma el último elemento, que nunca coincide.
+            lookup = np.append(np.asarray(category_matches, dtype=bool), False)
+            mask |= lookup[serie.cat.codes.to_numpy()]
+    if 'LEGAJO' in dataframe.columns and search_text.isdigit():
+        legajos = pd.to_numeric(dataframe['LEGAJO'], errors='coerce').round().astype('Int64').astype('string')
+        mask |= legajos.str.contains(search_text, regex=False).fillna(False).to_numpy(dtype=bool)
+    return dataframe[mask]
+
+def get_page(dataframe, page_index, page_size, sort_column=None, ascending=True):
+    """Devuelve sólo la ventana de filas visible, ordenada por `sort_column` si se indica."""
+    start = page_index * page_size
+    stop = start + page_size
+    if sort_column is None or sort_column not in dataframe.columns:
+        return dataframe.iloc[start:stop]
+    order = (
+        dataframe[sort_column]
+        .reset_index(drop=True)
+        .sort_values(ascending=ascending, kind='stable', na_position='last')
+        .index.to_numpy()
+    )
+    return dataframe.iloc[order[start:stop]]
+
+# --- Exportaciones ---
+# Filas por lote en las exportaciones en streaming y en el cálculo del hash de contenido.
+EXPORT_CHUNK_ROWS = 20_000
+# Cantidad de exportaciones en streaming que se conservan en disco.
+EXPORT_MAX_FILES = 8
+
+def table_content_hash(df_to_hash):
+    """Hash del contenido de una tabla (valores y nombres de columnas), calculado por lotes."""
+    hasher = hashlib.sha256()
+    hasher.update(repr(list(df_to_hash.columns)).encode('utf-8'))
+    for start in range(0, len(df_to_hash), EXPORT_CHUNK_ROWS):
+        chunk = df_to_hash.iloc[start:start + EXPORT_CHUNK_ROWS]
+        hasher.update(pd.util.hash_pandas_object(chunk, index=False).to_numpy().tobytes())
+    return hasher.hexdigest()
+
+def serialize_table_bytes(df_to_download, file_format):
+    """Serializa una tabla completa en memoria a CSV (texto) o Excel (bytes)."""
+    if file_format == 'csv':
+        csv_buffer = io.StringIO()
+        df_to_download.to_csv(csv_buffer, index=False)
+        return csv_buffer.getvalue()
+    excel_buffer = io.BytesIO()
+    df_to_download.to_excel(excel_buffer, index=False, engine='openpyxl')
+    return excel_buffer.getvalue()
+
+def iter_export_chunks(df_to_export):
+    """Recorre la tabla en lotes de EXPORT_CHUNK_ROWS filas."""
+    for start in range(0, len(df_to_export), EXPORT_CHUNK_ROWS):
+        yield df_to_export.iloc[start:start + EXPORT_CHUNK_ROWS]
+
+def write_csv_stream(df_to_export, destination):
+    """Escribe la tabla como CSV lote por lote."""
+    text_stream = io.TextIOWrapper(destination, encoding='utf-8', newline='')
+    df_to_export.head(0).to_csv(text_stream, index=False)
+    for chunk in iter_export_chunks(df_to_export):
+        chunk.to_csv(text_stream, index=False, header=False)
+    text_stream.flush()
+    text_stream.detach()
+
+def write_xlsx_stream(df_to_export, destination, sheet_name='Sheet1'):
+    """Escribe la tabla como Excel con el modo write-only de openpyxl (memoria acotada)."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+    worksheet.append([str(col) for col in df_to_export.columns])
+    for chunk in iter_export_chunks(df_to_export):
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            worksheet.append(row)
+    workbook.save(destination)
+
+def export_table_streaming(df_to_export, file_format):
+    """Exporta una tabla grande en streaming a un archivo en disco y devuelve sus bytes.
+
+    El archivo se identifica por el hash del contenido, de modo que una segunda descarga
+    de los mismos datos reutiliza el archivo ya escrito. Los bytes se leen con el
+    archivo abierto sólo durante la lectura: no queda ningún descriptor pendiente.
+    """
+    writer = write_csv_stream if file_format == 'csv' else write_xlsx_stream
+    export_dir = SNAPSHOT_DIR / 'exports'
+    export_path = export_dir / f'{table_content_hash(df_to_export)[:20]}.{file_format}'
+    try:
+        if not export_path.exists():
+            export_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = export_path.with_name(export_path.name + '.tmp')
+            with open(tmp_path, 'wb') as destination:
+                writer(df_to_export, destination)
+            os.replace(tmp_path, export_path)
+            old_exports = sorted(
+                (path for path in export_dir.iterdir() if path.suffix in ('.csv', '.xlsx')),
+                key=lambda path: path.stat().st_mtime,
+                reverse=True,
+            )
+            for old_export in old_exports[EXPORT_MAX_FILES:]:
+                old_export.unlink(missing_ok=True)
+        with open(export_path, 'rb') as exported:
+            return exported.read()
+    except OSError:
+        # Sin acceso al disco de caché: se exporta a un archivo temporal, que se borra al cerrarlo.
+        with tempfile.TemporaryFile() as destination:
+            writer(df_to_export, destination)
+            destination.seek(0)
+            return destination.read()
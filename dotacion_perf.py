@@ -0,0 +1,157 @@
+"""Instrumentación opcional de las secciones del dashboard.
+
+Mide el tiempo, las filas de entrada y salida y la memoria asignada de cada
+sección de una ejecución, y deja cada ejecución como una línea JSON en un log
+que se puede agregar entre sesiones. No depende de Streamlit.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotacion_data import SNAPSHOT_DIR
+
+# Variable de entorno que activa la instrumentación para todas las sesiones.
+PROFILE_ENV = 'DOTACION_PROFILE'
+# Log JSON-lines con una línea por ejecución del script o por descarga.
+PROFILE_LOG = Path(os.environ.get('DOTACION_PROFILE_LOG', SNAPSHOT_DIR / 'perfil' / 'ejecuciones.jsonl'))
+# Tamaño a partir del cual el log se rota (se conserva un archivo anterior, '.1').
+PROFILE_LOG_MAX_BYTES = int(float(os.environ.get('DOTACION_PROFILE_LOG_MB', 5)) * 2**20)
+VALORES_ACTIVOS = ('1', 'true', 'si', 'sí', 'on')
+
+# tracemalloc es global al proceso: se enciende sólo mientras alguna sección medida
+# lo necesita y se apaga al terminar la última, salvo que ya estuviera activo antes.
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started_here = False
+
+def _acquire_tracing():
+    global _tracing_users, _tracing_started_here
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started_here = True
+        _tracing_users += 1
+
+def _release_tracing():
+    global _tracing_users, _tracing_started_here
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_started_here:
+            tracemalloc.stop()
+            _tracing_started_here = False
+
+def profiling_requested(query_value=None):
+    """Indica si la instrumentación está activa por variable de entorno o por `?profile=1`."""
+    valores = (os.environ.get(PROFILE_ENV, ''), query_value or '')
+    return any(str(valor).strip().lower() in VALORES_ACTIVOS for valor in valores)
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+
+class RerunProfiler:
+    """Acumula las mediciones de las secciones de una ejecución del script.
+
+    Desactivado, `section` y `timed` no miden nada y no agregan costo. La
+    memoria se mide con tracemalloc, que se activa sólo mientras dura cada
+    sección medida; como es global al proceso, con varias sesiones ejecutando
+    a la vez el pico asignado es aproximado.
+    """
+
+    def __init__(self, enabled, session_id=None, log_path=PROFILE_LOG, downloads=None, trace_memory=True):
+        self.enabled = enabled
+        self.session_id = session_id
+        self.log_path = Path(log_path)
+        self.trace_memory = enabled and trace_memory
+        self.sections = []
+        # Lista compartida entre ejecuciones de la sesión con las descargas medidas.
+        self.downloads = downloads if downloads is not None else []
+        self.started_at = _now_iso()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def _measure(self, name, rows_in):
+        record = {'section': name, 'rows_in': rows_in, 'rows_out': None}
+        if self.trace_memory:
+            _acquire_tracing()
+            tracemalloc.reset_peak()
+            memoria_inicial = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            if self.trace_memory:
+                actual, pico = tracemalloc.get_traced_memory()
+                _release_tracing()
+                record['peak_mb'] = max(pico - memoria_inicial, 0) / 2**20
+                record['net_mb'] = (actual - memoria_inicial) / 2**20
+
+    @contextmanager
+    def section(self, name, rows_in=None):
+        """Mide una sección; el registro devuelto admite completar `rows_out`."""
+        if not self.enabled:
+            yield {}
+            return
+        with self._measure(name, rows_in) as record:
+            try:
+                yield record
+            finally:
+                self.sections.append(record)
+
+    def timed(self, name, func, rows_in=None):
+        """Envuelve una función diferida (una descarga) para medirla cuando se ejecute."""
+        if not self.enabled:
+            return func
+
+        def run():
+            with self._measure(name, rows_in) as record:
+                result = func()
+            record.update(kind='descarga', timestamp=_now_iso(), session_id=self.session_id, rows_out=rows_in)
+            self.downloads.append(record)
+            self._append(record)
+            return result
+        return run
+
+    def finish(self, **context):
+        """Cierra la ejecución, agrega su resumen al log y lo devuelve."""
+        if not self.enabled:
+            return None
+        entry = {
+            'kind': 'ejecucion',
+            'timestamp': self.started_at,
+            'session_id': self.session_id,
+            'total_seconds': time.perf_counter() - self._start,
+            **context,
+            'sections': self.sections,
+        }
+        self._append(entry)
+        return entry
+
+    def _append(self, entry):
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            if self.log_path.exists() and self.log_path.stat().st_size >= PROFILE_LOG_MAX_BYTES:
+                os.replace(self.log_path, self.log_path.with_name(self.log_path.name + '.1'))
+            with open(self.log_path, 'a', encoding='utf-8') as log:
+                log.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+        except OSError:
+            # El log es auxiliar: si no se puede escribir, el panel sigue funcionando.
+            pass
+
+def sections_table(entry):
+    """Tabla de secciones de una ejecución, para mostrar en el panel."""
+    filas = []
+    for record in entry['sections']:
+        filas.append({
+            'Sección': record['section'],
+            'Tiempo (ms)': round(record['seconds'] * 1000, 1),
+            'Filas entrada': record.get('rows_in'),
+            'Filas salida': record.get('rows_out'),
+            'Memoria pico (MB)': round(record['peak_mb'], 2) if 'peak_mb' in record else None,
+        })
+    return filas
@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Los módulos del dashboard están en la raíz del repositorio.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import dotacion_data as dd  # noqa: E402
+
+
+def build_clean_frame(n_rows=600, seed=0):
+    """DataFrame limpio sintético: dimensiones Categorical y filas ordenadas por Año."""
+    rng = np.random.default_rng(seed)
+    periodos = [f'{mes} {anio}' for anio in (2024, 2025) for mes in dd.MESES[:3]]
+    valores = {
+        'Gerencia': ['GG', 'Operaciones', 'Comercial', 'Sistemas'],
+        'Relación': ['Convenio', 'Fuera de convenio'],
+        'Sexo': ['Femenino', 'Masculino'],
+        'Función': ['Técnico', 'Administrativo', 'Operario'],
+        'Distrito': ['Norte', 'Sur', 'Centro'],
+        'Ministerio': ['Obras', 'Ambiente'],
+        'Rango Antiguedad': dd.ORDEN_RANGO_ANTIGUEDAD[:4],
+        'Rango Edad': dd.ORDEN_RANGO_EDAD[2:6],
+        'Nivel': ['1.0', '2.0', '3.0'],
+    }
+    columnas = {'LEGAJO': rng.integers(1000, 1000 + n_rows // 3, n_rows)}
+    for col, opciones in valores.items():
+        columnas[col] = rng.choice(opciones, n_rows)
+    columnas['Periodo'] = rng.choice(periodos, n_rows)
+    df = pd.DataFrame(columnas)
+    df[dd.YEAR_COLUMN] = df['Periodo'].str[-4:]
+    for col in dd.DIMENSION_COLUMNS:
+        df[col] = dd.to_dimension_categorical(df[col], col)
+    return dd.sort_by_year(df)
+
+
+@pytest.fixture(scope='session')
+def clean_frame():
+    return build_clean_frame()
@@ -0,0 +1,43 @@
+"""Desglose con los primeros N valores y el resto agrupado en 'Otros'."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import dotacion_data as dd
+
+
+def expected_top(counts, n, offset):
+    # Mayor cantidad primero; a igual cantidad, el orden original de la categoría.
+    ordenados = counts.iloc[np.lexsort((np.arange(len(counts)), -counts['Cantidad'].to_numpy()))]
+    k = min(offset + n, len(counts))
+    tabla = ordenados.iloc[offset:k].reset_index(drop=True)
+    resto = len(counts) - k
+    if resto > 0:
+        otros = pd.DataFrame({'Gerencia': [dd.OTROS_LABEL], 'Cantidad': [ordenados['Cantidad'].iloc[k:].sum()]})
+        tabla = pd.concat([tabla, otros], ignore_index=True)
+    return tabla, resto
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_coincide_con_orden_completo(seed):
+    rng = np.random.default_rng(seed)
+    n_valores = int(rng.integers(1, 40))
+    counts = pd.DataFrame({
+        'Gerencia': [f'G{i:02d}' for i in range(n_valores)],
+        # Pocas cantidades distintas, para que haya empates.
+        'Cantidad': rng.integers(1, 8, n_valores),
+    })
+    n, offset = int(rng.integers(1, 20)), int(rng.integers(0, 10))
+    tabla = dd.top_n_counts(counts, 'Gerencia', n, offset)
+    esperado, resto = expected_top(counts, n, offset)
+    assert tabla.attrs['otros'] == resto
+    assert tabla['Gerencia'].tolist() == esperado['Gerencia'].tolist()
+    assert tabla['Cantidad'].tolist() == esperado['Cantidad'].tolist()
+
+
+def test_total_se_conserva():
+    counts = pd.DataFrame({'Gerencia': list('ABCDE'), 'Cantidad': [5, 9, 1, 9, 3]})
+    tabla = dd.top_n_counts(counts, 'Gerencia', n=2)
+    assert tabla['Gerencia'].tolist() == ['B', 'D', dd.OTROS_LABEL]
+    assert tabla['Cantidad'].tolist() == [9, 9, 9]
+    assert tabla.attrs['otros'] == 3
@@ -0,0 +1,31 @@
+"""Exportación por lotes de los datos brutos."""
+import io
+
+import pandas as pd
+import pytest
+
+import dotacion_data as dd
+
+
+@pytest.fixture
+def tabla():
+    return pd.DataFrame({'LEGAJO': range(25), 'Gerencia': [f'G{i % 4}' for i in range(25)]})
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'xlsx'])
+def test_devuelve_bytes_y_reutiliza_el_archivo(tabla, file_format, tmp_path, monkeypatch):
+    monkeypatch.setattr(dd, 'SNAPSHOT_DIR', tmp_path)
+    monkeypatch.setattr(dd, 'EXPORT_CHUNK_ROWS', 7)
+    contenido = dd.export_table_streaming(tabla, file_format)
+    assert isinstance(contenido, bytes)
+    assert dd.export_table_streaming(tabla, file_format) == contenido
+    assert len(list((tmp_path / 'exports').iterdir())) == 1
+    leer = pd.read_csv if file_format == 'csv' else pd.read_excel
+    pd.testing.assert_frame_equal(leer(io.BytesIO(contenido)), tabla)
+
+
+def test_sin_disco_de_cache_usa_un_temporal(tabla, tmp_path, monkeypatch):
+    bloqueado = tmp_path / 'archivo'
+    bloqueado.write_text('no es un directorio')
+    monkeypatch.setattr(dd, 'SNAPSHOT_DIR', bloqueado)
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(dd.export_table_streaming(tabla, 'csv'))), tabla)
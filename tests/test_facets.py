@@ -0,0 +1,43 @@
+"""Conteos facetados de la barra lateral contra el filtrado con pandas."""
+import numpy as np
+import pytest
+
+import dotacion_data as dd
+
+from test_filter_index import expected_rows, random_selections
+
+LINKED = {dd.YEAR_COLUMN: ['Periodo']}
+
+
+def expected_facets(df, selections, linked):
+    facets = {}
+    for col in dd.DIMENSION_COLUMNS:
+        ignoradas = {col} | set(linked.get(col, ()))
+        filas = expected_rows(df, {c: v for c, v in selections.items() if c not in ignoradas})
+        conteos = filas[col].value_counts()
+        facets[col] = {valor: int(conteos.get(valor, 0)) for valor in df[col].cat.categories}
+    return facets
+
+
+@pytest.mark.parametrize('linked', [{}, LINKED])
+def test_actualizaciones_sucesivas(clean_frame, linked):
+    cube = dd.HeadcountCube(clean_frame, dd.DIMENSION_COLUMNS, range_column=dd.YEAR_COLUMN)
+    counter = dd.FacetCounter(cube, linked)
+    rng = np.random.default_rng(1)
+    selections = {col: [] for col in dd.DIMENSION_COLUMNS}
+    for paso in range(30):
+        # Se cambia una sola columna o varias a la vez, como en la barra lateral.
+        if paso % 3:
+            col = dd.DIMENSION_COLUMNS[rng.integers(len(dd.DIMENSION_COLUMNS))]
+            selections[col] = random_selections(clean_frame, rng, [col])[col]
+        else:
+            selections = random_selections(clean_frame, rng)
+        assert counter.update(selections) == expected_facets(clean_frame, selections, linked)
+
+
+def test_sin_cambios_devuelve_los_mismos_conteos(clean_frame):
+    cube = dd.HeadcountCube(clean_frame, dd.DIMENSION_COLUMNS, range_column=dd.YEAR_COLUMN)
+    counter = dd.FacetCounter(cube, LINKED)
+    selections = {'Sexo': ['Femenino']}
+    primera = counter.update(selections)
+    assert counter.update(dict(selections)) is primera
@@ -0,0 +1,84 @@
+"""Descarga con espejo local contra un servidor HTTP local."""
+import threading
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import dotacion_data as dd
+
+CONTENIDO = b'libro de prueba'
+ETAG = '"v1"'
+
+
+class WorkbookHandler(BaseHTTPRequestHandler):
+    respuestas = []
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == ETAG:
+            self.respuestas.append(304)
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.respuestas.append(200)
+        self.send_response(200)
+        self.send_header('ETag', ETAG)
+        self.send_header('Content-Length', str(len(CONTENIDO)))
+        self.end_headers()
+        self.wfile.write(CONTENIDO)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    WorkbookHandler.respuestas = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), WorkbookHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def espejo_temporal(tmp_path, monkeypatch):
+    # Equivale a DOTACION_CACHE_DIR / DOTACION_REFRESH_TTL, que se leen al importar el módulo.
+    monkeypatch.setattr(dd, 'MIRROR_DIR', tmp_path / 'espejo')
+    monkeypatch.setattr(dd, 'FETCH_REFRESH_TTL', 0)
+    monkeypatch.setattr(dd, 'FETCH_TIMEOUT', 2)
+
+
+def url_de(server):
+    return f'http://127.0.0.1:{server.server_address[1]}/Dotacion_25.xlsx'
+
+
+def test_descarga_y_revalidacion_con_304(servidor):
+    url = url_de(servidor)
+    assert dd.fetch_workbook_bytes(url) == CONTENIDO
+    assert dd.fetch_workbook_bytes(url) == CONTENIDO
+    assert WorkbookHandler.respuestas == [200, 304]
+
+
+def test_dentro_del_ttl_no_usa_la_red(servidor, monkeypatch):
+    url = url_de(servidor)
+    dd.fetch_workbook_bytes(url)
+    monkeypatch.setattr(dd, 'FETCH_REFRESH_TTL', 3600)
+    assert dd.fetch_workbook_bytes(url) == CONTENIDO
+    assert WorkbookHandler.respuestas == [200]
+
+
+def test_sin_red_sirve_el_espejo(servidor):
+    url = url_de(servidor)
+    dd.fetch_workbook_bytes(url)
+    servidor.shutdown()
+    servidor.server_close()
+    assert dd.fetch_workbook_bytes(url) == CONTENIDO
+
+
+def test_sin_red_ni_espejo_falla(servidor):
+    url = url_de(servidor)
+    servidor.shutdown()
+    servidor.server_close()
+    with pytest.raises(urllib.error.URLError):
+        dd.fetch_workbook_bytes(url)
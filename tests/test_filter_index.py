@@ -0,0 +1,76 @@
+"""Índice de filtros por bitmaps contra las máscaras equivalentes de pandas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import dotacion_data as dd
+
+
+def expected_rows(df, selections):
+    mask = np.ones(len(df), dtype=bool)
+    for col, selected in selections.items():
+        if selected:
+            mask &= df[col].isin(selected).to_numpy()
+    return df[mask]
+
+
+def random_selections(df, rng, columns=dd.DIMENSION_COLUMNS):
+    selections = {}
+    for col in columns:
+        opciones = df[col].cat.categories.tolist()
+        # Sin filtro, todo seleccionado o un subconjunto al azar.
+        modo = rng.integers(3)
+        if modo == 0:
+            selections[col] = []
+        elif modo == 1:
+            selections[col] = opciones
+        else:
+            selections[col] = list(rng.choice(opciones, rng.integers(1, len(opciones) + 1), replace=False))
+    return selections
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_apply_coincide_con_isin(clean_frame, seed):
+    index = dd.BitmapFilterIndex(clean_frame, dd.DIMENSION_COLUMNS)
+    selections = random_selections(clean_frame, np.random.default_rng(seed))
+    pd.testing.assert_frame_equal(index.apply(clean_frame, selections), expected_rows(clean_frame, selections))
+
+
+def test_sin_selecciones_devuelve_el_mismo_dataframe(clean_frame):
+    index = dd.BitmapFilterIndex(clean_frame, dd.DIMENSION_COLUMNS)
+    todo = {col: clean_frame[col].cat.categories.tolist() for col in dd.DIMENSION_COLUMNS}
+    assert index.apply(clean_frame, {}) is clean_frame
+    assert index.apply(clean_frame, todo) is clean_frame
+
+
+def test_valor_inexistente_no_devuelve_filas(clean_frame):
+    index = dd.BitmapFilterIndex(clean_frame, dd.DIMENSION_COLUMNS)
+    assert index.apply(clean_frame, {'Gerencia': ['No existe']}).empty
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_recorte_por_anio_coincide_con_isin(clean_frame, seed):
+    index = dd.BitmapFilterIndex(clean_frame, dd.DIMENSION_COLUMNS, range_column=dd.YEAR_COLUMN)
+    assert index.range_column == dd.YEAR_COLUMN
+    selections = random_selections(clean_frame, np.random.default_rng(seed))
+    esperado = expected_rows(clean_frame, selections)
+    pd.testing.assert_frame_equal(index.apply(clean_frame, selections), esperado)
+    pd.testing.assert_frame_equal(index.take(clean_frame, index.select(selections)), esperado)
+
+
+@pytest.mark.parametrize('anios', [['2024'], ['2025'], ['2024', '2025'], ['2030']])
+def test_recorte_por_anio_sin_otros_filtros(clean_frame, anios):
+    index = dd.BitmapFilterIndex(clean_frame, dd.DIMENSION_COLUMNS, range_column=dd.YEAR_COLUMN)
+    selections = {dd.YEAR_COLUMN: anios}
+    start, stop, mask = index.select(selections)
+    # Los años forman rangos contiguos: no hace falta máscara.
+    assert mask is None
+    pd.testing.assert_frame_equal(clean_frame.iloc[start:stop], expected_rows(clean_frame, selections))
+
+
+def test_sin_orden_por_anio_no_recorta_rangos(clean_frame):
+    desordenado = clean_frame.iloc[::-1].reset_index(drop=True)
+    index = dd.BitmapFilterIndex(desordenado, dd.DIMENSION_COLUMNS, range_column=dd.YEAR_COLUMN)
+    assert index.range_column is None
+    selections = {dd.YEAR_COLUMN: ['2025'], 'Sexo': ['Femenino']}
+    pd.testing.assert_frame_equal(index.apply(desordenado, selections), expected_rows(desordenado, selections))
@@ -0,0 +1,36 @@
+"""El DataFrame compartido entre sesiones queda de sólo lectura."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import dotacion_data as dd
+
+
+@pytest.fixture
+def frozen():
+    df = pd.DataFrame({
+        'LEGAJO': np.arange(4),
+        'Fecha ing.': pd.date_range('2020-01-01', periods=4),
+        'Gerencia': dd.to_dimension_categorical(pd.Series(['GG', 'Sistemas', 'GG', 'Comercial']), 'Gerencia'),
+    })
+    return dd.freeze_frame(df)
+
+
+@pytest.mark.parametrize('col, valor', [
+    ('LEGAJO', 99),
+    ('Fecha ing.', pd.Timestamp('2000-01-01')),
+    ('Gerencia', 'Sistemas'),
+])
+def test_escritura_en_el_lugar_falla(frozen, col, valor):
+    antes = frozen[col].copy()
+    # pandas no es uniforme en el tipo de error (las fechas fallan con AssertionError).
+    with pytest.raises((ValueError, AssertionError)):
+        frozen.iloc[0, frozen.columns.get_loc(col)] = valor
+    pd.testing.assert_series_equal(frozen[col], antes)
+
+
+def test_las_copias_se_pueden_modificar(frozen):
+    copia = frozen.copy()
+    copia.iloc[0, copia.columns.get_loc('Gerencia')] = 'Sistemas'
+    assert copia['Gerencia'].iloc[0] == 'Sistemas'
+    assert frozen['Gerencia'].iloc[0] == 'GG'
@@ -0,0 +1,65 @@
+"""Indicadores de la tarjeta de resumen contra un groupby directo sobre las filas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import dotacion_data as dd
+
+from test_filter_index import expected_rows, random_selections
+
+
+def naive_kpis(filas, periodos, breakdowns):
+    total = filas.groupby('Periodo', observed=True).size().reindex(periodos, fill_value=0)
+    registros = []
+    for col in breakdowns:
+        conteos = filas.groupby(['Periodo', col], observed=True).size().unstack(fill_value=0)
+        conteos = conteos.reindex(index=periodos, fill_value=0)
+        conteos = conteos.loc[:, conteos.sum() > 0]
+        for valor in conteos.columns:
+            serie = conteos[valor]
+            for i, periodo in enumerate(periodos):
+                cantidad = int(serie.iloc[i])
+                registros.append({
+                    'Periodo': periodo, 'Apertura': col, 'Valor': str(valor), 'Cantidad': cantidad,
+                    'Porcentaje': cantidad / total.iloc[i] * 100 if total.iloc[i] else 0.0,
+                    'Variación': cantidad - serie.iloc[i - 1] if i else np.nan,
+                })
+    return total, pd.DataFrame(registros)
+
+
+def kpi_cero(valor):
+    return valor['Cantidad'] == 0 and valor['Porcentaje'] == 0.0 and np.isnan(valor['Variación'])
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_coincide_con_groupby(clean_frame, seed):
+    rng = np.random.default_rng(seed)
+    cube = dd.HeadcountCube(clean_frame, dd.DIMENSION_COLUMNS, range_column=dd.YEAR_COLUMN)
+    selections = random_selections(clean_frame, rng)
+    todos = clean_frame['Periodo'].cat.categories.tolist()
+    # Un subconjunto de periodos en orden cronológico, a veces con alguno sin filas tras el filtro.
+    periodos = sorted(rng.choice(todos, rng.integers(1, len(todos) + 1), replace=False), key=todos.index)
+
+    totales, kpis = dd.compute_kpis(cube.filter(selections), periodos)
+    total, esperado = naive_kpis(expected_rows(clean_frame, selections), periodos, dd.KPI_BREAKDOWNS)
+
+    assert totales['Periodo'].tolist() == periodos
+    assert totales['Cantidad'].tolist() == total.tolist()
+    np.testing.assert_array_equal(totales['Variación'].to_numpy()[1:], np.diff(total.to_numpy()))
+    if esperado.empty:
+        assert kpis.empty
+        return
+    clave = ['Apertura', 'Valor', 'Periodo']
+    obtenido = kpis.sort_values(clave).reset_index(drop=True)
+    esperado = esperado.sort_values(clave).reset_index(drop=True)
+    pd.testing.assert_frame_equal(obtenido[esperado.columns], esperado, check_dtype=False)
+
+
+def test_kpi_value_sin_empleados_devuelve_ceros(clean_frame):
+    cube = dd.HeadcountCube(clean_frame, dd.DIMENSION_COLUMNS, range_column=dd.YEAR_COLUMN)
+    periodo = clean_frame['Periodo'].cat.categories[0]
+    _, kpis = dd.compute_kpis(cube.filter({}), [periodo])
+    assert kpi_cero(dd.kpi_value(kpis, periodo, 'Sexo', 'No existe'))
+    assert dd.kpi_value(kpis, periodo, 'Sexo', 'Femenino')['Cantidad'] == (
+        (clean_frame['Periodo'] == periodo) & (clean_frame['Sexo'] == 'Femenino')).sum()
+
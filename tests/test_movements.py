@@ -0,0 +1,65 @@
+"""Altas, bajas y cambios entre periodos consecutivos."""
+import numpy as np
+import pandas as pd
+
+import dotacion_data as dd
+
+
+def frame(filas):
+    df = pd.DataFrame(filas, columns=['Periodo', 'LEGAJO', 'Gerencia', 'Función', 'Nivel'])
+    for col in ['Periodo', 'Gerencia', 'Función', 'Nivel']:
+        df[col] = dd.to_dimension_categorical(df[col], col)
+    return df
+
+
+def test_altas_bajas_y_cambios():
+    df = frame([
+        ('Enero 2025', 1, 'GG', 'Técnico', '1'),
+        ('Enero 2025', 2, 'GG', 'Técnico', '1'),
+        ('Enero 2025', 3, 'Sistemas', 'Técnico', '2'),
+        ('Enero 2025', np.nan, 'GG', 'Técnico', '1'),
+        ('Febrero 2025', 1, 'GG', 'Técnico', '1'),
+        ('Febrero 2025', 3, 'Comercial', 'Técnico', '3'),
+        ('Febrero 2025', 4, 'GG', 'Operario', '1'),
+        ('Febrero 2025', 4, 'Sistemas', 'Operario', '1'),
+        ('Marzo 2025', 1, 'GG', 'Técnico', '1'),
+        ('Marzo 2025', 3, 'Comercial', 'Técnico', '3'),
+        ('Marzo 2025', 4, 'GG', 'Operario', '1'),
+    ])
+    movimientos = dd.compute_movements(df)
+    filas = list(zip(movimientos['Periodo'], movimientos['LEGAJO'], movimientos['Movimiento'], movimientos['Gerencia']))
+    assert filas == [
+        ('Febrero 2025', 4, 'Alta', 'GG'),
+        ('Febrero 2025', 2, 'Baja', 'GG'),
+        ('Febrero 2025', 3, 'Cambio', 'Comercial'),
+    ]
+    cambio = movimientos.iloc[2]
+    assert cambio['Gerencia Anterior'] == 'Sistemas'
+    assert cambio['Nivel Anterior'] == '2'
+    # La Función no cambió: su columna 'Anterior' queda vacía.
+    assert pd.isna(cambio['Función Anterior'])
+
+    resumen = dd.summarize_movements(movimientos)
+    assert resumen.to_dict('list') == {
+        'Periodo': ['Febrero 2025', 'Marzo 2025'],
+        'Altas': [1, 0], 'Bajas': [1, 0], 'Cambios': [1, 0], 'Neto': [0, 0],
+    }
+
+
+def test_coincide_con_comparacion_por_conjuntos(clean_frame):
+    movimientos = dd.compute_movements(clean_frame)
+    primeras = clean_frame.drop_duplicates(['Periodo', 'LEGAJO'])
+    periodos = [p for p in clean_frame['Periodo'].cat.categories if (clean_frame['Periodo'] == p).any()]
+    for anterior, actual in zip(periodos, periodos[1:]):
+        antes = primeras[primeras['Periodo'] == anterior].set_index('LEGAJO')
+        despues = primeras[primeras['Periodo'] == actual].set_index('LEGAJO')
+        comunes = antes.index.intersection(despues.index)
+        cambiados = {
+            legajo for legajo in comunes
+            if any(antes.at[legajo, col] != despues.at[legajo, col] for col in dd.MOVEMENT_COLUMNS)
+        }
+        del_periodo = movimientos[movimientos['Periodo'] == actual]
+        por_tipo = {tipo: set(del_periodo.loc[del_periodo['Movimiento'] == tipo, 'LEGAJO']) for tipo in dd.TIPOS_MOVIMIENTO}
+        assert por_tipo['Alta'] == set(despues.index.difference(antes.index))
+        assert por_tipo['Baja'] == set(antes.index.difference(despues.index))
+        assert por_tipo['Cambio'] == cambiados
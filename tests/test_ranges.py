@@ -0,0 +1,36 @@
+"""Rangos de edad y antigüedad contra pd.cut sobre los años cumplidos."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import dotacion_data as dd
+
+RANGOS = [
+    (dd.BINS_ANTIGUEDAD, dd.ORDEN_RANGO_ANTIGUEDAD[:-1]),
+    (dd.BINS_EDAD, dd.ORDEN_RANGO_EDAD[:-1]),
+]
+
+
+@pytest.mark.parametrize('bins_years, labels', RANGOS)
+def test_bin_days_coincide_con_pd_cut(bins_years, labels):
+    rng = np.random.default_rng(0)
+    limites = np.ceil(np.asarray(bins_years) * dd.DIAS_POR_ANIO).astype(np.int64)
+    # Días al azar, más los límites exactos y el día anterior a cada uno.
+    dias = np.concatenate([rng.integers(-30, 80 * 365, 5000), limites, limites - 1, [-1]])
+    anios = np.where(dias >= 0, dias / dd.DIAS_POR_ANIO, np.nan)
+    esperado = pd.cut(anios, bins=list(bins_years) + [np.inf], right=False, labels=labels)
+    esperado = esperado.add_categories('no disponible').fillna('no disponible')
+
+    resultado = dd.bin_days(dias, bins_years, labels)
+    assert list(resultado.categories) == list(labels) + ['no disponible']
+    assert np.array_equal(np.asarray(resultado, dtype=object), np.asarray(esperado, dtype=object))
+
+
+def test_days_between_al_cierre_del_periodo():
+    periodos = pd.Series(pd.to_datetime(['2025-02-01', '2025-02-01', None]))
+    referencia = dd.period_reference_dates(periodos)
+    assert str(referencia[0]) == '2025-02-28'
+    dias = dd.days_between(pd.Series(['2024-02-28', None, '2025-01-01']), referencia)
+    assert dias[:2].tolist() == [366, -1]
+    # Sin Periodo con fecha se usa la fecha de hoy.
+    assert dias[2] > 0
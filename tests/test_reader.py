@@ -0,0 +1,95 @@
+"""Lectura en streaming de las hojas anuales contra pd.read_excel."""
+import io
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+
+import dotacion_data as dd
+
+ENCABEZADO = ['LEGAJO', 'Observaciones', 'Gerencia', 'Sexo', 'Nivel', 'Fecha ing.', 'Fecha Nac.',
+              'Periodo', 'Rango (Edad)', 'Rango (Antigüedad)']
+
+
+def build_workbook(n_rows=120, seed=0):
+    """Libro con celdas vacías, filas en blanco al final, una columna mixta y otra sin valores."""
+    rng = np.random.default_rng(seed)
+    libro = openpyxl.Workbook()
+    hoja = libro.active
+    hoja.title = 'Dotacion_25'
+    hoja.append(ENCABEZADO)
+    for i in range(n_rows):
+        hoja.append([
+            1000 + i,
+            f'nota {i}',
+            ['GG', 'Sistemas', 'Comercial', None][i % 4],
+            ['Femenino', 'Masculino'][i % 2],
+            None if i % 7 == 0 else int(rng.integers(1, 4)),
+            datetime(2000 + i % 20, 1 + i % 12, 1),
+            None if i % 11 == 0 else datetime(1960 + i % 40, 6, 15),
+            datetime(2025, 1 + i % 3, 1),
+            None,
+            # Números y textos en la misma columna: read_excel la deja object.
+            ('0-5' if i % 10 == 0 else 3) if i % 5 == 0 else None,
+        ])
+    # Filas con formato pero sin valores, habituales al final de las hojas.
+    for _ in range(3):
+        hoja.append([None] * len(ENCABEZADO))
+    contenido = io.BytesIO()
+    libro.save(contenido)
+    return contenido.getvalue()
+
+
+@pytest.fixture(scope='module')
+def contenido():
+    return build_workbook()
+
+
+def leer_con_pandas(contenido, columnas):
+    df = pd.read_excel(io.BytesIO(contenido), sheet_name='Dotacion_25')
+    return df[[col for col in df.columns if col in columnas]].dropna(how='all').reset_index(drop=True)
+
+
+@pytest.mark.parametrize('chunk_rows', [7, 50, 10_000])
+def test_mismos_valores_y_tipos_que_read_excel(contenido, chunk_rows):
+    esperado = leer_con_pandas(contenido, dd.SOURCE_COLUMNS)
+    leido = dd.read_sheet_columns(contenido, 'Dotacion_25', chunk_rows=chunk_rows)
+    # Sólo se leen las columnas proyectadas, en el orden de la hoja.
+    assert list(leido.columns) == list(esperado.columns)
+    for col in esperado.columns:
+        serie = leido[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Los textos (y el Periodo con fechas, que clean_data reemplaza) quedan Categorical;
+            # las columnas numéricas de read_excel nunca.
+            assert not pd.api.types.is_numeric_dtype(esperado[col]), col
+            pd.testing.assert_series_equal(serie.astype(object), esperado[col].astype(object), obj=col)
+        else:
+            assert serie.dtype == esperado[col].dtype, col
+            pd.testing.assert_series_equal(serie, esperado[col], obj=col)
+
+
+@pytest.mark.parametrize('chunk_rows', [7, 10_000])
+def test_limpieza_igual_que_con_read_excel(contenido, chunk_rows):
+    esperado = dd.clean_data(leer_con_pandas(contenido, dd.SOURCE_COLUMNS), 2025)
+    limpio = dd.clean_data(dd.read_sheet_columns(contenido, 'Dotacion_25', chunk_rows=chunk_rows), 2025)
+    for col in dd.DIMENSION_COLUMNS:
+        assert limpio[col].astype(object).tolist() == esperado[col].astype(object).tolist(), col
+    # Un Nivel entero con celdas vacías se muestra como en read_excel ('1.0').
+    assert '1.0' in limpio['Nivel'].cat.categories
+
+
+def test_hojas_anuales(contenido):
+    assert dd.list_year_sheets(contenido) == [('Dotacion_25', 2025)]
+
+
+def test_carga_incremental_con_los_mismos_tipos(contenido, tmp_path, monkeypatch):
+    monkeypatch.setattr(dd, 'PARTITION_DIR', tmp_path)
+    hoja = dd.read_sheet_columns(contenido, 'Dotacion_25')
+    fria = dd.clean_by_partition([(hoja, 2025)])
+    # Un mes modificado se limpia de nuevo; los demás se leen de sus particiones.
+    modificada = hoja.copy()
+    modificada.loc[0, 'LEGAJO'] = 1
+    incremental = dd.clean_by_partition([(modificada, 2025)])
+    assert fria.dtypes.to_dict() == incremental.dtypes.to_dict()
@@ -0,0 +1,80 @@
+"""Caché de resultados compartida: LRU acotado por memoria y versiones del dataset."""
+import numpy as np
+import pandas as pd
+
+import dotacion_data as dd
+
+KB = 1024
+
+
+def bloque(kb):
+    return np.zeros(kb * KB, dtype=np.uint8)
+
+
+def calcular(cache, version, clave, kb, llamadas):
+    def compute():
+        llamadas.append((version, clave))
+        return bloque(kb)
+    return cache.get_or_compute(version, clave, compute)
+
+
+def test_acierto_no_vuelve_a_calcular():
+    cache, llamadas = dd.ResultCache(max_bytes=100 * KB), []
+    primero = calcular(cache, 'v1', 'a', 1, llamadas)
+    assert calcular(cache, 'v1', 'a', 1, llamadas) is primero
+    assert llamadas == [('v1', 'a')]
+    assert cache.stats()['aciertos'] == 1 and cache.stats()['fallos'] == 1
+
+
+def test_desaloja_lo_usado_hace_mas_tiempo_al_superar_el_limite():
+    cache, llamadas = dd.ResultCache(max_bytes=35 * KB), []
+    for clave in 'abc':
+        calcular(cache, 'v1', clave, 10, llamadas)
+    calcular(cache, 'v1', 'a', 10, llamadas)   # 'a' pasa a ser la más reciente
+    calcular(cache, 'v1', 'd', 10, llamadas)   # se desaloja 'b'
+    assert cache.nbytes <= cache.max_bytes
+    llamadas.clear()
+    for clave in 'acd':
+        calcular(cache, 'v1', clave, 10, llamadas)
+    assert llamadas == []
+    calcular(cache, 'v1', 'b', 10, llamadas)
+    assert llamadas == [('v1', 'b')]
+
+
+def test_resultado_mayor_que_el_limite_no_se_guarda():
+    cache, llamadas = dd.ResultCache(max_bytes=5 * KB), []
+    calcular(cache, 'v1', 'chico', 1, llamadas)
+    calcular(cache, 'v1', 'grande', 10, llamadas)
+    assert cache.stats()['entradas'] == 1
+    calcular(cache, 'v1', 'chico', 1, llamadas)
+    assert llamadas == [('v1', 'chico'), ('v1', 'grande')]
+
+
+def test_versiones_distintas_no_comparten_resultados_ni_se_borran():
+    cache, llamadas = dd.ResultCache(max_bytes=100 * KB), []
+    calcular(cache, 'v1', 'a', 1, llamadas)
+    calcular(cache, 'v2', 'a', 1, llamadas)
+    # Sesiones en la versión vieja y en la nueva se alternan sin vaciar la caché.
+    for _ in range(3):
+        calcular(cache, 'v1', 'a', 1, llamadas)
+        calcular(cache, 'v2', 'a', 1, llamadas)
+    assert llamadas == [('v1', 'a'), ('v2', 'a')]
+
+
+def test_la_version_vieja_se_desaloja_primero():
+    cache, llamadas = dd.ResultCache(max_bytes=25 * KB), []
+    calcular(cache, 'v1', 'a', 10, llamadas)
+    calcular(cache, 'v1', 'b', 10, llamadas)
+    calcular(cache, 'v2', 'a', 10, llamadas)
+    calcular(cache, 'v2', 'b', 10, llamadas)
+    llamadas.clear()
+    calcular(cache, 'v2', 'a', 10, llamadas)
+    calcular(cache, 'v2', 'b', 10, llamadas)
+    assert llamadas == []
+    assert cache.stats()['entradas'] == 2
+
+
+def test_result_nbytes_cuenta_dataframes_y_tuplas():
+    df = pd.DataFrame({'x': np.arange(1000, dtype=np.int64)})
+    assert dd.result_nbytes(df) >= 8000
+    assert dd.result_nbytes((df, bloque(1), None)) >= 8000 + KB
@@ -0,0 +1,46 @@
+"""Formato de números y variación mes a mes."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import dotacion_data as dd
+
+
+@pytest.mark.parametrize('decimals', [0, 1, 2])
+def test_format_fixed_coincide_con_format(decimals):
+    rng = np.random.default_rng(decimals)
+    valores = np.concatenate([rng.uniform(-5000, 5000, 500), rng.integers(-300, 300, 100)])
+    # Se descartan los valores a menos de medio decimal del cero, que format muestra como '-0.00'.
+    valores = valores[np.abs(valores) >= 10 ** -decimals]
+    esperado = [f'{valor:.{decimals}f}%' for valor in valores]
+    assert list(dd.format_fixed(valores, decimals, '%')) == esperado
+
+
+def test_format_fixed_faltantes_y_signo():
+    resultado = dd.format_fixed([np.nan, -1.5, 0.004, 12, np.inf], 2, '%')
+    assert list(resultado) == ['', '-1.50%', '0.00%', '12.00%', '']
+
+
+def test_build_variation_total():
+    counts = pd.DataFrame({'Periodo': ['Enero 2025', 'Febrero 2025', 'Marzo 2025'], 'Cantidad': [100, 110, 99]})
+    var_counts, display = dd.build_variation(counts)
+    assert var_counts['Cantidad_Actual'].tolist() == [100, 110, 99]
+    assert var_counts['Variacion_Cantidad'].tolist()[1:] == [10, -11]
+    assert var_counts['label'].tolist() == ['', '10 (10.00%)', '-11 (-10.00%)']
+    assert display['Variacion_%'].tolist() == ['', '10.00%', '-10.00%']
+
+
+def test_build_variation_por_grupo_omite_grupos_sin_dotacion():
+    counts = pd.DataFrame({
+        'Periodo': ['Enero 2025', 'Enero 2025', 'Febrero 2025', 'Marzo 2025'],
+        'Sexo': ['Femenino', 'Masculino', 'Femenino', 'Femenino'],
+        'Cantidad': [4, 2, 5, 5],
+    })
+    var_counts, _ = dd.build_variation(counts, 'Sexo')
+    filas = list(zip(var_counts['Sexo'], var_counts['Periodo'], var_counts['Cantidad_Actual']))
+    # Masculino pasa a 0 en Febrero (baja de 2) y no aporta fila en Marzo.
+    assert filas == [
+        ('Femenino', 'Enero 2025', 4), ('Femenino', 'Febrero 2025', 5), ('Femenino', 'Marzo 2025', 5),
+        ('Masculino', 'Enero 2025', 2), ('Masculino', 'Febrero 2025', 0),
+    ]
+    assert var_counts['label'].tolist()[-1] == '-2 (-100.00%)'